@@ -1,24 +1,43 @@
 import random
-from typing import Dict, List, Optional, Sequence
+from typing import Dict, List, Optional, Sequence, Union
+
+from counter_rng import CounterRandom
+from population import ColumnarPopulation, IndexedPopulation
 
 
 class Dropouts:
-    """Handle monthly customer churn for each subscription tier."""
+    """Handle monthly customer churn for each subscription tier.
+
+    With a ``seed``, each month's draws for a plan come from the counter-based
+    stream (seed, "dropout", month, plan) instead of the global ``random``
+    module, so a run is reproducible and independent of what else drew first.
+    """
 
     def __init__(
         self,
-        users: Dict[str, List],
+        users: Union[Dict[str, List], ColumnarPopulation],
         plan_names: Optional[Sequence[str]] = None,
         min_percent: float = 0.01,
         max_percent: float = 0.03,
+        seed: Optional[int] = None,
     ) -> None:
+        if isinstance(users, ColumnarPopulation):
+            users = users.group_by_plan()
         # Keep a reference to the shared users dict so we can mutate it in-place.
         self.users = users
+        self.population = IndexedPopulation(users)
         self.plan_names = list(plan_names) if plan_names else list(users.keys())
         self.min_percent = min_percent
         self.max_percent = max_percent
+        self.seed = seed
+        self.month = 0
+
+    def _rng(self, group: str):
+        if self.seed is None:
+            return random
+        return CounterRandom(self.seed, "dropout", self.month, group)
 
-    def _dropout_count(self, group: str) -> int:
+    def _dropout_count(self, group: str, rng=random) -> int:
         """
         Decide how many users should leave a given group this month.
         Ensures we never request more users than we have and that a positive
@@ -28,7 +47,7 @@ class Dropouts:
         if total == 0:
             return 0
 
-        percent = random.uniform(self.min_percent, self.max_percent)
+        percent = rng.uniform(self.min_percent, self.max_percent)
         count = int(total * percent)
         if count == 0 and percent > 0:
             count = 1  # guarantee some churn if the group is non-empty
@@ -41,17 +60,15 @@ class Dropouts:
         """
         dropped: Dict[str, List] = {}
         for group in self.plan_names:
-            members = self.users[group]
-            count = self._dropout_count(group)
+            rng = self._rng(group)
+            count = self._dropout_count(group, rng)
             if count == 0:
                 dropped[group] = []
                 continue
 
-            leaving = random.sample(members, count)
-            for user in leaving:
-                members.remove(user)
-            dropped[group] = leaving
+            dropped[group] = self.population.take_sample(group, count, rng)
 
+        self.month += 1
         return dropped
 
     def print_dropouts(self, dropped: Dict[str, List], month: str) -> None:
@@ -1,13 +1,32 @@
-import csv
 import random
-from typing import Dict, List, Optional, Sequence
+from pathlib import Path
+from typing import Dict, List, Optional, Sequence, Union
 
 from Dropout import Dropouts
+from counter_rng import CounterRandom
+from population import ColumnarPopulation, IndexedPopulation
+from sinks import ResultSink, make_sink
 
 
 class MonthlyChanges:
-    def __init__(self, users: Dict[str, List], plan_names: Optional[Sequence[str]] = None):
+    """One simulated year of plan migrations and churn.
+
+    Draws come from the global ``random`` module unless a ``seed`` is given, in
+    which case every (month, plan) step uses its own counter-based stream.
+    """
+
+    def __init__(
+        self,
+        users: Union[Dict[str, List], ColumnarPopulation],
+        plan_names: Optional[Sequence[str]] = None,
+        seed: Optional[int] = None,
+    ):
+        if isinstance(users, ColumnarPopulation):
+            # Work on lightweight row views grouped by plan.
+            users = users.group_by_plan()
         self.users = users
+        self.population = IndexedPopulation(users)
+        self.seed = seed
         self.plan_names = list(plan_names) if plan_names is not None else list(users.keys())
         self.month_names = [
             "January",
@@ -24,17 +43,13 @@ class MonthlyChanges:
             "December",
         ]
 
-    def migrate(self, source_group: str, dest_group: str, percent: float) -> None:
+    def migrate(self, source_group: str, dest_group: str, percent: float, rng=None) -> None:
         """Move a percentage of people from one group to another."""
-        src_list = self.users[source_group]
-        amount = int(len(src_list) * percent)
+        amount = int(self.population.size(source_group) * percent)
         if amount == 0:
             return
 
-        to_move = random.sample(src_list, amount)
-        for user in to_move:
-            src_list.remove(user)
-            self.users[dest_group].append(user)
+        self.population.move(source_group, dest_group, amount, rng)
 
     @staticmethod
     def _display_user(user) -> str:
@@ -44,43 +59,58 @@ class MonthlyChanges:
             return user.gamer_tag
         return str(user)
 
-    def apply_monthly_changes(self) -> None:
-        """Simulate churn/migrations for one calendar year and write the CSV."""
-        initial_users = []
-        initial_counts = {}
-        for group, user_list in self.users.items():
-            initial_counts[group] = len(user_list)
-            for user in user_list:
-                initial_users.append((user, group))
-
-        drop = Dropouts(self.users, plan_names=self.plan_names)
+    def apply_monthly_changes(
+        self,
+        output_path: Union[str, Path, None] = None,
+        fmt: str = "csv",
+        quiet: bool = False,
+        sink: Optional[ResultSink] = None,
+    ) -> ResultSink:
+        """Simulate churn/migrations for one calendar year and write the results.
 
-        with open("monthly_changes.csv", "w", newline="") as file:
-            writer = csv.writer(file)
-            writer.writerow(["Month", *self.plan_names])
+        ``fmt`` picks the sink (csv, ndjson or columnar) unless a ready ``sink``
+        is passed; ``output_path`` defaults to ``monthly_changes.<ext>``.
+        ``quiet`` skips the per-month console report. Returns the sink used.
+        """
+        initial_counts = [len(self.users[group]) for group in self.plan_names]
+        initial_users = [
+            (user, group) for group, user_list in self.users.items() for user in user_list
+        ]
 
-            for month in self.month_names:
+        drop = Dropouts(self.users, plan_names=self.plan_names, seed=self.seed)
+        sink = sink or make_sink(fmt, output_path)
+        sink.open(self.plan_names)
+        try:
+            for month_index, month in enumerate(self.month_names):
                 for group in self.plan_names:
-                    percent = random.uniform(0.01, 0.05)
+                    rng = (
+                        random
+                        if self.seed is None
+                        else CounterRandom(self.seed, "migrate", month_index, group)
+                    )
+                    percent = rng.uniform(0.01, 0.05)
                     destination_candidates = [g for g in self.plan_names if g != group]
-                    destination = random.choice(destination_candidates)
-                    self.migrate(group, destination, percent)
+                    destination = rng.choice(destination_candidates)
+                    self.migrate(group, destination, percent, rng)
 
                 dropped = drop.apply_dropouts()
 
-                writer.writerow([month, *[len(self.users[g]) for g in self.plan_names]])
-
-                print(f"\n{month}:")
-                for group in self.plan_names:
-                    print(f"  {group:<9}: {len(self.users[group])}")
-                drop.print_dropouts(dropped, month)
+                sink.write_month(
+                    month,
+                    [len(self.users[g]) for g in self.plan_names],
+                    [len(dropped.get(g, [])) for g in self.plan_names],
+                )
 
-            writer.writerow([])
-            writer.writerow(["Initial Number of Users per Plan"])
-            for group in self.plan_names:
-                writer.writerow([group, initial_counts[group]])
+                if not quiet:
+                    print(f"\n{month}:")
+                    for group in self.plan_names:
+                        print(f"  {group:<9}: {len(self.users[group])}")
+                    drop.print_dropouts(dropped, month)
 
-            writer.writerow([])
-            writer.writerow(["Initial Users", "Plan"])
-            for user, plan in initial_users:
-                writer.writerow([self._display_user(user), plan])
+            sink.write_initial_counts(initial_counts)
+            sink.write_initial_users(
+                (self._display_user(user), plan) for user, plan in initial_users
+            )
+        finally:
+            sink.close()
+        return sink
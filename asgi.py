@@ -0,0 +1,209 @@
+"""
+ASGI serving mode for the MUDTPass API.
+
+Exposes exactly the routes of ``server.app``: every request is handed to the
+Flask WSGI app on a thread pool, so blocking SQLite work never runs on the
+event loop. ``/api/analytics/monthly`` is special-cased: on a cache miss the
+projection runs on a process pool first (at most ``MAX_SIMULATIONS`` at a
+time, identical requests sharing one run) and the Flask route then answers
+from the warmed projection cache; if writes keep outdating the result, the
+request gets a 503 with ``Retry-After`` instead of an inline simulation.
+Cheap endpoints keep flowing while simulations are in flight.
+
+Run with any ASGI server, e.g. ``uvicorn asgi:app`` or ``python asgi.py``.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import io
+import json
+import os
+import sys
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from typing import Dict, List, Optional, Tuple
+from urllib.parse import parse_qsl
+
+from werkzeug.datastructures import MultiDict
+
+import server
+from projection import project_from_path
+
+MAX_SIMULATIONS = int(os.environ.get("MUDTPASS_MAX_SIMULATIONS", 2))
+SIMULATION_WORKERS = int(os.environ.get("MUDTPASS_SIMULATION_WORKERS", MAX_SIMULATIONS))
+IO_THREADS = int(os.environ.get("MUDTPASS_IO_THREADS", 16))
+# Process-pool runs per request before giving up on a population that keeps changing.
+WARM_ATTEMPTS = 3
+
+_io_pool = ThreadPoolExecutor(max_workers=IO_THREADS, thread_name_prefix="mudtpass-io")
+_simulation_pool: Optional[ProcessPoolExecutor] = None
+_simulation_slots: Optional[asyncio.Semaphore] = None
+_in_flight: Dict[tuple, asyncio.Future] = {}
+
+
+def _wsgi_environ(scope: Dict, body: bytes) -> Dict:
+    host, port = scope.get("server") or ("localhost", 80)
+    environ = {
+        "REQUEST_METHOD": scope["method"],
+        "SCRIPT_NAME": scope.get("root_path", "").encode("utf-8").decode("latin-1"),
+        "PATH_INFO": scope["path"].encode("utf-8").decode("latin-1"),
+        "QUERY_STRING": scope.get("query_string", b"").decode("latin-1"),
+        "SERVER_NAME": host,
+        "SERVER_PORT": str(port),
+        "SERVER_PROTOCOL": f"HTTP/{scope.get('http_version', '1.1')}",
+        "REMOTE_ADDR": (scope.get("client") or ("", 0))[0],
+        "wsgi.version": (1, 0),
+        "wsgi.url_scheme": scope.get("scheme", "http"),
+        "wsgi.input": io.BytesIO(body),
+        "wsgi.errors": sys.stderr,
+        "wsgi.multithread": True,
+        "wsgi.multiprocess": False,
+        "wsgi.run_once": False,
+        "CONTENT_LENGTH": str(len(body)),
+    }
+    for raw_name, raw_value in scope.get("headers", []):
+        name = raw_name.decode("latin-1").upper().replace("-", "_")
+        value = raw_value.decode("latin-1")
+        if name == "CONTENT_TYPE":
+            environ["CONTENT_TYPE"] = value
+            continue
+        if name == "CONTENT_LENGTH":
+            continue
+        key = f"HTTP_{name}"
+        environ[key] = f"{environ[key]},{value}" if key in environ else value
+    return environ
+
+
+def _call_wsgi(environ: Dict) -> Tuple[int, List[Tuple[bytes, bytes]], bytes]:
+    """Run the Flask app synchronously (on a worker thread) and collect the response."""
+    response: Dict = {}
+
+    def start_response(status: str, headers: List[Tuple[str, str]], exc_info=None):
+        response["status"] = int(status.split(" ", 1)[0])
+        response["headers"] = [
+            (name.lower().encode("latin-1"), value.encode("latin-1")) for name, value in headers
+        ]
+        return lambda data: None
+
+    result = server.app(environ, start_response)
+    try:
+        body = b"".join(result)
+    finally:
+        if hasattr(result, "close"):
+            result.close()
+    return response["status"], response["headers"], body
+
+
+async def _warm_projection(query_string: bytes) -> bool:
+    """Compute a missing projection on the process pool and store it in the cache.
+
+    Returns False when writes kept outdating the result for ``WARM_ATTEMPTS``
+    runs; the caller then answers 503 rather than letting the Flask route
+    simulate inline on an IO thread.
+    """
+    global _simulation_pool, _simulation_slots
+    try:
+        seed, months, engine = server.projection_params(
+            MultiDict(parse_qsl(query_string.decode("latin-1")))
+        )
+    except ValueError:
+        return True  # let the Flask route report the validation error
+    if not server.is_ready():
+        return True  # the Flask app answers 503 until startup seeding is done
+    for _ in range(WARM_ATTEMPTS):
+        key = server.projection_key(seed, months, engine)
+        if key in server.projection_cache:
+            return True
+
+        pending = _in_flight.get(key)
+        if pending is None:
+            if _simulation_pool is None:
+                _simulation_pool = ProcessPoolExecutor(max_workers=SIMULATION_WORKERS)
+                _simulation_slots = asyncio.Semaphore(MAX_SIMULATIONS)
+            pending = asyncio.ensure_future(_run_projection(seed, months, engine))
+            _in_flight[key] = pending
+            pending.add_done_callback(lambda _, key=key: _in_flight.pop(key, None))
+        try:
+            await asyncio.shield(pending)
+        except Exception:  # noqa: BLE001 - the Flask route recomputes and reports errors
+            return True
+    return server.projection_key(seed, months, engine) in server.projection_cache
+
+
+async def _run_projection(seed: int, months: int, engine: str) -> None:
+    loop = asyncio.get_running_loop()
+    async with _simulation_slots:
+        projection, population_version = await loop.run_in_executor(
+            _simulation_pool, project_from_path, str(server.DB_PATH), seed, engine, months
+        )
+    # Keyed on the population the worker actually simulated, not on the
+    # version current when the run was queued.
+    key = server.projection_key_at(seed, months, engine, population_version)
+    if key is not None:
+        server.projection_cache.put(key, projection)
+
+
+async def _read_body(receive) -> bytes:
+    chunks = []
+    while True:
+        message = await receive()
+        if message["type"] == "http.disconnect":
+            break
+        chunks.append(message.get("body", b""))
+        if not message.get("more_body"):
+            break
+    return b"".join(chunks)
+
+
+async def _lifespan(receive, send) -> None:
+    while True:
+        message = await receive()
+        if message["type"] == "lifespan.startup":
+            await send({"type": "lifespan.startup.complete"})
+        elif message["type"] == "lifespan.shutdown":
+            if _simulation_pool is not None:
+                _simulation_pool.shutdown(cancel_futures=True)
+            _io_pool.shutdown(wait=False)
+            await send({"type": "lifespan.shutdown.complete"})
+            return
+
+
+async def _send_busy(send) -> None:
+    body = json.dumps({"error": "Projection is being recomputed; retry shortly."}).encode()
+    headers = [
+        (b"content-type", b"application/json"),
+        (b"content-length", str(len(body)).encode("latin-1")),
+        (b"retry-after", b"1"),
+    ]
+    await send({"type": "http.response.start", "status": 503, "headers": headers})
+    await send({"type": "http.response.body", "body": body})
+
+
+async def app(scope, receive, send) -> None:
+    """ASGI entry point."""
+    if scope["type"] == "lifespan":
+        await _lifespan(receive, send)
+        return
+    if scope["type"] != "http":
+        return
+
+    body = await _read_body(receive)
+    if scope["method"] == "GET" and scope["path"] == "/api/analytics/monthly":
+        if not await _warm_projection(scope.get("query_string", b"")):
+            await _send_busy(send)
+            return
+
+    loop = asyncio.get_running_loop()
+    status, headers, payload = await loop.run_in_executor(
+        _io_pool, _call_wsgi, _wsgi_environ(scope, body)
+    )
+    await send({"type": "http.response.start", "status": status, "headers": headers})
+    await send({"type": "http.response.body", "body": payload})
+
+
+if __name__ == "__main__":  # pragma: no cover
+    try:
+        import uvicorn
+    except ImportError:
+        raise SystemExit("The ASGI mode needs an ASGI server: pip install uvicorn")
+    uvicorn.run("asgi:app", port=int(os.environ.get("PORT", 5000)))
@@ -0,0 +1,274 @@
+"""
+Benchmark suite for the MUDTPass hot paths.
+
+Each case runs at every requested population size against databases in a
+temporary directory. Wall time is the best of ``--repeat`` untraced runs;
+peak memory comes from one extra run under ``tracemalloc``. Results are
+written as JSON and can be compared against a stored baseline:
+
+    python benchmark.py --sizes 1000,100000 --output bench.json
+    python benchmark.py --baseline bench.json --threshold 0.25
+
+The comparison exits with status 1 when any case is slower (or uses more
+memory) than the baseline by more than the threshold.
+"""
+
+from __future__ import annotations
+
+import argparse
+import gc
+import json
+import platform
+import random
+import tempfile
+import time
+import tracemalloc
+from dataclasses import asdict, dataclass
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional, Sequence
+
+from Monthly import MonthlyChanges
+from database import GamePassDatabase, seed_database
+from people import PeopleGenerator
+from projection import project_monthly_performance
+from simulator import SubscriptionSimulator
+from sinks import CsvSink
+
+DEFAULT_SIZES = (1_000, 100_000, 1_000_000)
+DEFAULT_THRESHOLD = 0.20
+SEED = 1337
+# get_users_by_plan is sub-millisecond, so it is timed over a batch of calls.
+SAMPLE_CALLS = 200
+
+
+@dataclass
+class BenchmarkResult:
+    case: str
+    size: int
+    seconds: float
+    peak_bytes: Optional[int]
+    repeat: int
+
+
+class Fixture:
+    """Per-size shared state: a scratch directory and a lazily seeded database."""
+
+    def __init__(self, size: int, workdir: Path) -> None:
+        self.size = size
+        self.workdir = workdir
+        self._db_path: Optional[Path] = None
+        self._scratch = 0
+
+    @property
+    def db_path(self) -> Path:
+        if self._db_path is None:
+            self._db_path = self.workdir / f"seeded-{self.size}.db"
+            seed_database(str(self._db_path), total_users=self.size, seed=SEED)
+        return self._db_path
+
+    def seeded_db(self) -> GamePassDatabase:
+        db = GamePassDatabase(str(self.db_path))
+        db.initialize()
+        return db
+
+    def scratch_db(self) -> GamePassDatabase:
+        self._scratch += 1
+        db = GamePassDatabase(str(self.workdir / f"scratch-{self.size}-{self._scratch}.db"))
+        db.initialize()
+        return db
+
+    def generator(self) -> PeopleGenerator:
+        return PeopleGenerator(self.size, seed=SEED)
+
+
+@dataclass
+class Case:
+    """``setup`` builds the inputs outside the timer; ``run`` is what gets measured."""
+
+    name: str
+    setup: Callable[[Fixture], Any]
+    run: Callable[[Any], Any]
+
+
+def _setup_persist(fixture: Fixture):
+    generator = fixture.generator()
+    return fixture.scratch_db(), generator, generator.generate()
+
+
+def _run_persist(state) -> None:
+    db, generator, users = state
+    db.persist(generator.plan_catalog, generator.plan_names, users)
+
+
+def _setup_users_by_plan(fixture: Fixture):
+    db = fixture.seeded_db()
+    return db, db.get_plan_catalog()["order"]
+
+
+def _run_users_by_plan(state) -> None:
+    db, plans = state
+    for call in range(SAMPLE_CALLS):
+        db.get_users_by_plan(plans[call % len(plans)], limit=8, seed=call)
+
+
+def _setup_monthly(fixture: Fixture):
+    generator = fixture.generator()
+    users = generator.generate()
+    random.seed(SEED)
+    sink = CsvSink(fixture.workdir / f"monthly-{fixture.size}.csv")
+    return MonthlyChanges(users, plan_names=generator.plan_names), sink
+
+
+def _run_monthly(state) -> None:
+    monthly, sink = state
+    monthly.apply_monthly_changes(quiet=True, sink=sink)
+
+
+CASES: Dict[str, Case] = {
+    case.name: case
+    for case in (
+        Case("generate", Fixture.generator, PeopleGenerator.generate),
+        Case("persist", _setup_persist, _run_persist),
+        Case("user_summary", Fixture.seeded_db, GamePassDatabase.get_user_summary),
+        Case("users_by_plan", _setup_users_by_plan, _run_users_by_plan),
+        Case(
+            "projection",
+            Fixture.seeded_db,
+            lambda db: project_monthly_performance(db, seed=SEED),
+        ),
+        Case(
+            "profit_simulation",
+            lambda fixture: SubscriptionSimulator(fixture.db_path),
+            lambda simulator: simulator.simulate(reuse=False),
+        ),
+        Case("monthly_changes", _setup_monthly, _run_monthly),
+    )
+}
+
+
+def measure(case: Case, fixture: Fixture, repeat: int, memory: bool) -> BenchmarkResult:
+    timings = []
+    for _ in range(repeat):
+        state = case.setup(fixture)
+        gc.collect()
+        started = time.perf_counter()
+        case.run(state)
+        timings.append(time.perf_counter() - started)
+        del state
+
+    peak = None
+    if memory:
+        state = case.setup(fixture)
+        gc.collect()
+        tracemalloc.start()
+        try:
+            case.run(state)
+            peak = tracemalloc.get_traced_memory()[1]
+        finally:
+            tracemalloc.stop()
+        del state
+    return BenchmarkResult(case.name, fixture.size, round(min(timings), 6), peak, repeat)
+
+
+def run_suite(
+    sizes: Sequence[int],
+    case_names: Sequence[str],
+    repeat: int = 3,
+    memory: bool = True,
+    verbose: bool = True,
+) -> List[BenchmarkResult]:
+    results = []
+    for size in sizes:
+        with tempfile.TemporaryDirectory(prefix="mudtpass-bench-") as workdir:
+            fixture = Fixture(size, Path(workdir))
+            for name in case_names:
+                result = measure(CASES[name], fixture, repeat, memory)
+                results.append(result)
+                if verbose:
+                    print(_format_result(result), flush=True)
+    return results
+
+
+def compare(
+    results: Sequence[BenchmarkResult], baseline: Dict, threshold: float
+) -> List[str]:
+    """Return one line per case that regressed past ``threshold`` against ``baseline``."""
+    previous = {(entry["case"], entry["size"]): entry for entry in baseline["results"]}
+    regressions = []
+    for result in results:
+        before = previous.get((result.case, result.size))
+        if before is None:
+            continue
+        checks = [("time", result.seconds, before["seconds"])]
+        if result.peak_bytes is not None and before.get("peak_bytes"):
+            checks.append(("memory", result.peak_bytes, before["peak_bytes"]))
+        for label, now, then in checks:
+            if then > 0 and now > then * (1 + threshold):
+                regressions.append(
+                    f"{result.case}@{result.size} {label}: {then:g} -> {now:g} "
+                    f"(+{(now / then - 1) * 100:.1f}%)"
+                )
+    return regressions
+
+
+def _format_result(result: BenchmarkResult) -> str:
+    memory = (
+        f"{result.peak_bytes / 1_048_576:9.1f} MiB" if result.peak_bytes is not None else "         -"
+    )
+    return f"{result.case:<18} {result.size:>9} users {result.seconds:>10.4f}s {memory}"
+
+
+def _report(results: Sequence[BenchmarkResult], repeat: int) -> Dict:
+    return {
+        "meta": {
+            "created": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "repeat": repeat,
+        },
+        "results": [asdict(result) for result in results],
+    }
+
+
+def _parse_sizes(text: str) -> List[int]:
+    return [int(part.replace("_", "")) for part in text.split(",") if part.strip()]
+
+
+if __name__ == "__main__":  # pragma: no cover
+    parser = argparse.ArgumentParser(description="Benchmark the MUDTPass hot paths.")
+    parser.add_argument(
+        "--sizes",
+        type=_parse_sizes,
+        default=list(DEFAULT_SIZES),
+        help="Comma-separated population sizes (default 1000,100000,1000000).",
+    )
+    parser.add_argument("--cases", default=",".join(CASES), help="Comma-separated case names.")
+    parser.add_argument("--repeat", type=int, default=3, help="Timed runs per case (best wins).")
+    parser.add_argument("--no-memory", action="store_true", help="Skip the tracemalloc run.")
+    parser.add_argument("--output", default=None, help="Write results as JSON to this path.")
+    parser.add_argument("--baseline", default=None, help="JSON results to compare against.")
+    parser.add_argument(
+        "--threshold",
+        type=float,
+        default=DEFAULT_THRESHOLD,
+        help="Allowed slowdown before a case counts as a regression (0.2 = 20%%).",
+    )
+    args = parser.parse_args()
+
+    names = [name.strip() for name in args.cases.split(",") if name.strip()]
+    unknown = [name for name in names if name not in CASES]
+    if unknown:
+        parser.error(f"Unknown case(s): {', '.join(unknown)}. Choose from: {', '.join(CASES)}.")
+
+    suite = run_suite(args.sizes, names, repeat=args.repeat, memory=not args.no_memory)
+    if args.output:
+        Path(args.output).write_text(json.dumps(_report(suite, args.repeat), indent=2) + "\n")
+        print(f"\nResults written to {args.output}")
+    if args.baseline:
+        found = compare(suite, json.loads(Path(args.baseline).read_text()), args.threshold)
+        for line in found:
+            print(f"REGRESSION {line}")
+        if found:
+            raise SystemExit(1)
+        print(f"\nNo regressions beyond {args.threshold:.0%} against {args.baseline}.")
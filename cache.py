@@ -0,0 +1,77 @@
+"""Small thread-safe LRU cache used for expensive, versioned API results."""
+
+from __future__ import annotations
+
+import threading
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Hashable, List, Tuple
+
+
+class LRUCache:
+    """Bounded mapping that evicts the least recently used entry first."""
+
+    def __init__(self, maxsize: int = 32) -> None:
+        if maxsize < 1:
+            raise ValueError("maxsize must be at least 1.")
+        self.maxsize = maxsize
+        self.hits = 0
+        self.misses = 0
+        self._entries: "OrderedDict[Hashable, Any]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: Hashable, default: Any = None) -> Any:
+        with self._lock:
+            if key in self._entries:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return self._entries[key]
+            self.misses += 1
+            return default
+
+    def put(self, key: Hashable, value: Any) -> None:
+        with self._lock:
+            self._entries[key] = value
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+
+    def get_or_compute(self, key: Hashable, compute: Callable[[], Any]) -> Any:
+        """Return the cached value for ``key`` or compute and store it."""
+        missing = object()
+        value = self.get(key, missing)
+        if value is missing:
+            # Compute outside the lock so slow results don't block other keys.
+            value = compute()
+            self.put(key, value)
+        return value
+
+    def discard(self, key: Hashable) -> None:
+        """Drop ``key`` if present."""
+        with self._lock:
+            self._entries.pop(key, None)
+
+    def __contains__(self, key: Hashable) -> bool:
+        """Presence check that counts neither as a hit/miss nor as use."""
+        with self._lock:
+            return key in self._entries
+
+    def items(self) -> List[Tuple[Hashable, Any]]:
+        """Snapshot of the entries, oldest first; does not count as use."""
+        with self._lock:
+            return list(self._entries.items())
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {
+                "size": len(self._entries),
+                "maxsize": self.maxsize,
+                "hits": self.hits,
+                "misses": self.misses,
+            }
+
+    def __len__(self) -> int:
+        return len(self._entries)
@@ -1,21 +1,129 @@
+import functools
+import hashlib
+import itertools
 import json
+import os
 import random
 import sqlite3
+import threading
+import time
+import uuid
 from pathlib import Path
-from typing import Dict, List, Optional, Sequence
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple, Union
 
+from group_commit import GroupCommitWriter
+from metrics import timed_query
 from people import GamePassUser, PeopleGenerator
+from pool import ConnectionPool
+from population import ColumnarPopulation
+
+
+def _writes(method):
+    """Run a GamePassDatabase method while holding the dedicated writer connection."""
+
+    @functools.wraps(method)
+    def wrapper(self, *args, **kwargs):
+        with self.pool.write():
+            return method(self, *args, **kwargs)
+
+    return wrapper
 
 
 class GamePassDatabase:
     """Simple SQLite wrapper to persist generated MUDTPass users and plans."""
 
-    def __init__(self, path: str = "mudtpass.db") -> None:
-        self.path = Path(path)
-        self.conn = sqlite3.connect(self.path, check_same_thread=False)
-        self.conn.row_factory = sqlite3.Row
+    # Histogram name -> users column, maintained in plan_summary_facets.
+    SUMMARY_FACETS = {"genre": "favorite_genre", "device": "preferred_device"}
+    SUMMARY_TRIGGERS = ("users_summary_insert", "users_summary_delete", "users_summary_update")
+    # meta key set while bulk_persist runs with the summary triggers dropped.
+    BULK_LOAD_MARKER = "bulk_load_in_progress"
+
+    # Secondary indexes on users; every ``WHERE plan = ?`` lookup and the
+    # summary rebuild aggregates are answered from one of these.
+    USER_INDEXES = {
+        "idx_users_plan_genre": "users(plan, favorite_genre)",
+        "idx_users_plan_device": "users(plan, preferred_device)",
+        "idx_users_plan_hours": "users(plan, hours_per_month)",
+        "idx_users_plan_id": "users(plan, id)",
+    }
+
+    # Top-2 genres and devices for every plan in one pass over the summary.
+    SUMMARY_QUERY = """
+        WITH ranked AS (
+            SELECT plan, facet, value,
+                   ROW_NUMBER() OVER (
+                       PARTITION BY plan, facet ORDER BY user_count DESC, value
+                   ) AS rank
+            FROM plan_summary_facets
+            WHERE user_count > 0
+        )
+        SELECT s.plan, s.user_count, s.hours_total, r.facet, r.value
+        FROM plan_summary AS s
+        LEFT JOIN ranked AS r ON r.plan = s.plan AND r.rank <= 2
+        WHERE s.user_count > 0
+        ORDER BY s.plan, r.facet, r.rank
+    """
+
+    INSERT_USER_SQL = """
+        INSERT INTO users (
+            full_name, gamer_tag, plan, preferred_device,
+            favorite_genre, hours_per_month, backlog
+        ) VALUES (?, ?, ?, ?, ?, ?, ?)
+    """
+
+    USER_SAMPLE_COLUMNS = (
+        "id, full_name, gamer_tag, preferred_device, favorite_genre, hours_per_month"
+    )
+    # Separate MIN/MAX subqueries so each is a single seek on idx_users_plan_id.
+    PLAN_ID_RANGE_QUERY = """
+        SELECT (SELECT MIN(id) FROM users WHERE plan = ?) AS low,
+               (SELECT MAX(id) FROM users WHERE plan = ?) AS high
+    """
+
+    # Rejection-sampling rounds before falling back to the plan's id list.
+    SAMPLE_ROUNDS = 8
+
+    # Seconds a write-behind subscribe waits for its group commit.
+    WRITE_BEHIND_TIMEOUT = 10.0
+
+    # Stored simulation results: one row per run plus one per (month, plan).
+    RUN_COLUMNS = "id, kind, params, population_version, summary, created_at, elapsed_seconds"
+    RUN_MONTH_COLUMNS = (
+        "month_index",
+        "month",
+        "plan_index",
+        "plan",
+        "users",
+        "total_hours",
+        "avg_hours",
+        "revenue",
+        "cost",
+        "profit",
+    )
+    RUN_INDEXES = {
+        "idx_simulation_runs_kind_created": "simulation_runs(kind, created_at)",
+    }
+
+    def __init__(self, path: str = "mudtpass.db", max_readers: int = 8) -> None:
+        self.path = Path(path) if str(path) != ":memory:" else path
+        self.pool = ConnectionPool(self.path, max_readers=max_readers)
+        # Writes (and reads inside write paths) use the dedicated writer.
+        self.conn = self.pool.writer
         self._random = random.Random()
+        # Bumped on every write that changes plans or users so cached results
+        # derived from the data (e.g. projections) can be keyed on it.
+        self.data_version = 0
+        # Distinguishes versions across restarts (the counter starts at 0 each time).
+        self.data_epoch = uuid.uuid4().hex[:12]
+        self._version_lock = threading.Lock()
+        self._write_behind: Optional[GroupCommitWriter] = None
+        # Decoded plan catalog, its JSON encoding and the subscribe lookup,
+        # rebuilt on first use after any write that touches plans.
+        self.catalog_version = 0
+        self._catalog: Optional[Tuple[Dict, bytes, Dict[str, Dict]]] = None
+        self._catalog_lock = threading.Lock()
 
+    @_writes
     def initialize(self) -> None:
         with self.conn:
             self.conn.execute(
@@ -52,6 +160,11 @@ class GamePassDatabase:
             )
         self._ensure_favorite_column()
         self._ensure_default_favorite()
+        self._ensure_meta_table()
+        self._ensure_summary_tables()
+        self._ensure_user_indexes()
+        self._ensure_run_tables()
+        self._invalidate_catalog()
 
     def seed_if_empty(self, generator: PeopleGenerator) -> None:
         if self.count_users() > 0:
@@ -59,68 +172,236 @@ class GamePassDatabase:
         users = generator.generate()
         self.persist(generator.plan_catalog, generator.plan_names, users)
 
+    @timed_query
+    @_writes
     def persist(
         self,
         plan_catalog: Dict[str, Dict],
         plan_order: Sequence[str],
-        users: Dict[str, List[GamePassUser]],
+        users: Union[Dict[str, List[GamePassUser]], ColumnarPopulation],
     ) -> None:
+        if isinstance(users, ColumnarPopulation):
+            rows = users.db_rows()
+        else:
+            rows = (self._user_row(member) for members in users.values() for member in members)
         with self.conn:
             self.conn.execute("DELETE FROM plans")
             self.conn.execute("DELETE FROM users")
+            self._insert_plans(plan_catalog, plan_order)
+            self.conn.executemany(self.INSERT_USER_SQL, rows)
+            self._touch_population_version()
+        self._bump_data_version(plans_changed=True)
 
-            for order, plan in enumerate(plan_order):
-                info = plan_catalog[plan]
+    @timed_query(rows=lambda stats: stats["rows"])
+    @_writes
+    def bulk_persist(
+        self,
+        plan_catalog: Dict[str, Dict],
+        plan_order: Sequence[str],
+        users: Union[Iterable[GamePassUser], ColumnarPopulation],
+        chunk_size: int = 50_000,
+    ) -> Dict[str, float]:
+        """Replace all plans and users from a (possibly lazy) stream of users.
+
+        Users are inserted in ``chunk_size`` batches through ``executemany``
+        so the full population never has to be in memory. During the load the
+        database runs in WAL mode with ``synchronous=OFF``; the summary
+        triggers and user indexes are dropped and rebuilt once the data is in.
+        Each chunk commits on its own, so a failed load leaves a partial
+        population behind; a ``meta`` marker makes the next ``initialize()``
+        rebuild the summary if the process dies mid-load. Returns row count,
+        elapsed seconds and rows/second.
+        """
+        started = time.perf_counter()
+        previous_journal = self.conn.execute("PRAGMA journal_mode").fetchone()[0]
+        previous_sync = self.conn.execute("PRAGMA synchronous").fetchone()[0]
+        self.conn.execute("PRAGMA journal_mode = WAL")
+        self.conn.execute("PRAGMA temp_store = MEMORY")
+        rows = 0
+        try:
+            with self.conn:
+                # Committed before anything is dropped: if the load dies before
+                # the rebuild below, initialize() sees the marker and redoes it.
                 self.conn.execute(
-                    """
-                    INSERT INTO plans (
-                        name, display_order, price, tagline, description, best_for,
-                        devices, perks, features, hours_range, is_favorite
-                    ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
-                    """,
-                    (
-                        plan,
-                        order,
-                        info["price"],
-                        info["tagline"],
-                        info["description"],
-                        info["best_for"],
-                        json.dumps(info["devices"]),
-                        json.dumps(info["perks"]),
-                        json.dumps(info["features"]),
-                        json.dumps(info["hours_range"]),
-                        1 if order == 0 else 0,
-                    ),
+                    "INSERT OR REPLACE INTO meta (key, value) VALUES (?, '1')",
+                    (self.BULK_LOAD_MARKER,),
                 )
+            self.conn.execute("PRAGMA synchronous = OFF")
+            with self.conn:
+                for trigger in self.SUMMARY_TRIGGERS:
+                    self.conn.execute(f"DROP TRIGGER IF EXISTS {trigger}")
+                for index in self.USER_INDEXES:
+                    self.conn.execute(f"DROP INDEX IF EXISTS {index}")
+                self.conn.execute("DELETE FROM plans")
+                self.conn.execute("DELETE FROM users")
+                self._insert_plans(plan_catalog, plan_order)
+                self._touch_population_version()
+
+            if isinstance(users, ColumnarPopulation):
+                user_rows = users.db_rows()
+            else:
+                user_rows = (self._user_row(member) for member in users)
+            while True:
+                chunk = list(itertools.islice(user_rows, chunk_size))
+                if not chunk:
+                    break
+                with self.conn:
+                    self.conn.executemany(self.INSERT_USER_SQL, chunk)
+                rows += len(chunk)
+        finally:
+            with self.conn:
+                for statement in self._summary_trigger_sql():
+                    self.conn.execute(statement)
+            self._ensure_user_indexes()
+            self.rebuild_summary()
+            with self.conn:
+                self.conn.execute("DELETE FROM meta WHERE key = ?", (self.BULK_LOAD_MARKER,))
+                # Runs stored against a partly loaded population must not match the result.
+                self._touch_population_version()
+            self.conn.execute(f"PRAGMA synchronous = {previous_sync}")
+            self.conn.execute(f"PRAGMA journal_mode = {previous_journal}")
+            self._bump_data_version(plans_changed=True)
+
+        elapsed = time.perf_counter() - started
+        return {
+            "rows": rows,
+            "seconds": round(elapsed, 3),
+            "rows_per_second": round(rows / elapsed, 1) if elapsed else float(rows),
+        }
+
+    @_writes
+    def create_snapshot(self, path: Union[str, Path]) -> Dict[str, float]:
+        """Copy the whole database to ``path`` with SQLite's online backup API.
+
+        The copy is written next to ``path`` and renamed into place, and is
+        left in rollback-journal mode so it stays a single self-contained file.
+        """
+        started = time.perf_counter()
+        target_path = Path(path)
+        partial = target_path.with_name(target_path.name + ".partial")
+        partial.unlink(missing_ok=True)
+        target = sqlite3.connect(partial)
+        try:
+            self.conn.backup(target)
+            target.execute("PRAGMA journal_mode = DELETE")
+        finally:
+            target.close()
+        os.replace(partial, target_path)
+        elapsed = time.perf_counter() - started
+        return {"bytes": target_path.stat().st_size, "seconds": round(elapsed, 3)}
+
+    @staticmethod
+    def has_snapshot(path: Union[str, Path]) -> bool:
+        """Whether :meth:`restore_snapshot` has a complete snapshot to read at ``path``."""
+        return Path(path).is_file()
+
+    @_writes
+    def restore_snapshot(self, path: Union[str, Path]) -> Dict[str, float]:
+        """Replace every table with the contents of a snapshot from :meth:`create_snapshot`.
 
-            for plan, members in users.items():
-                for member in members:
-                    self.conn.execute(
-                        """
-                        INSERT INTO users (
-                            full_name, gamer_tag, plan, preferred_device,
-                            favorite_genre, hours_per_month, backlog
-                        ) VALUES (?, ?, ?, ?, ?, ?, ?)
-                        """,
-                        (
-                            member.full_name,
-                            member.gamer_tag,
-                            member.plan,
-                            member.preferred_device,
-                            member.favorite_genre,
-                            member.hours_per_month,
-                            json.dumps(member.backlog),
-                        ),
-                    )
+        Pages are copied with the backup API, so no user rows are regenerated
+        or re-inserted; readers see the new data once the copy commits.
+        """
+        source_path = Path(path)
+        if not source_path.is_file():
+            raise FileNotFoundError(f"No snapshot at {source_path}.")
+        started = time.perf_counter()
+        source = sqlite3.connect(f"{source_path.resolve().as_uri()}?mode=ro", uri=True)
+        try:
+            source.backup(self.conn)
+        finally:
+            source.close()
+        # Snapshots taken before a schema change get the missing pieces added.
+        # The snapshot brings its own population token and the runs keyed on it.
+        self.initialize()
+        self._bump_data_version(plans_changed=True)
+        return {"rows": self.count_users(), "seconds": round(time.perf_counter() - started, 3)}
 
+    def _insert_plans(self, plan_catalog: Dict[str, Dict], plan_order: Sequence[str]) -> None:
+        for order, plan in enumerate(plan_order):
+            info = plan_catalog[plan]
+            self.conn.execute(
+                """
+                INSERT INTO plans (
+                    name, display_order, price, tagline, description, best_for,
+                    devices, perks, features, hours_range, is_favorite
+                ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+                """,
+                (
+                    plan,
+                    order,
+                    info["price"],
+                    info["tagline"],
+                    info["description"],
+                    info["best_for"],
+                    json.dumps(info["devices"]),
+                    json.dumps(info["perks"]),
+                    json.dumps(info["features"]),
+                    json.dumps(info["hours_range"]),
+                    1 if order == 0 else 0,
+                ),
+            )
+
+    @staticmethod
+    def _user_row(member: GamePassUser) -> tuple:
+        return (
+            member.full_name,
+            member.gamer_tag,
+            member.plan,
+            member.preferred_device,
+            member.favorite_genre,
+            member.hours_per_month,
+            json.dumps(member.backlog),
+        )
+
+    @timed_query
     def count_users(self) -> int:
-        row = self.conn.execute("SELECT COUNT(*) AS total FROM users").fetchone()
+        with self.pool.read() as conn:
+            row = conn.execute("SELECT COUNT(*) AS total FROM users").fetchone()
         return row["total"] if row else 0
 
+    def pool_stats(self) -> Dict[str, int]:
+        return self.pool.stats()
+
+    @timed_query
     def get_plan_catalog(self) -> Dict:
-        rows = self.conn.execute(
-            "SELECT * FROM plans ORDER BY display_order ASC"
-        ).fetchall()
+        """The decoded plan catalog; shared between callers, so treat it as read-only."""
+        return self._cached_catalog()[0]
+
+    def get_plan_catalog_json(self) -> bytes:
+        """``get_plan_catalog()`` serialized as a JSON response body."""
+        return self._cached_catalog()[1]
+
+    def _cached_catalog(self) -> Tuple[Dict, bytes, Dict[str, Dict]]:
+        cached = self._catalog
+        if cached is not None:
+            return cached
+        version = self.catalog_version
+        catalog = self._load_plan_catalog()
+        encoded = json.dumps(catalog, sort_keys=True, separators=(",", ":")) + "\n"
+        subscribable = {
+            name.lower(): {
+                "name": name,
+                "devices": info["devices"],
+                "hours_range": info["hours_range"],
+            }
+            for name, info in catalog["plans"].items()
+        }
+        cached = (catalog, encoded.encode("utf-8"), subscribable)
+        with self._catalog_lock:
+            # A plan write that landed while loading makes this copy stale.
+            if self.catalog_version == version:
+                self._catalog = cached
+        return cached
+
+    def _invalidate_catalog(self) -> None:
+        with self._catalog_lock:
+            self.catalog_version += 1
+            self._catalog = None
+
+    def _load_plan_catalog(self) -> Dict:
+        with self.pool.read() as conn:
+            rows = conn.execute("SELECT * FROM plans ORDER BY display_order ASC").fetchall()
         plan_data = {}
         order = []
         for row in rows:
@@ -140,58 +421,109 @@ class GamePassDatabase:
             }
         return {"order": order, "plans": plan_data}
 
+    @timed_query
     def get_user_summary(self) -> Dict:
+        """Per-plan counts, average hours and top genres/devices.
+
+        Reads the materialized ``plan_summary`` tables that the users triggers
+        keep current, so the cost depends on the number of plans rather than
+        the number of users.
+        """
         summary = {}
-        rows = self.conn.execute(
-            """
-            SELECT plan, COUNT(*) AS count, AVG(hours_per_month) AS avg_hours
-            FROM users
-            GROUP BY plan
-            """
-        ).fetchall()
+        with self.pool.read() as conn:
+            rows = conn.execute(self.SUMMARY_QUERY).fetchall()
         for row in rows:
-            summary[row["plan"]] = {
-                "count": row["count"],
-                "avg_hours": round(row["avg_hours"], 1) if row["avg_hours"] else 0,
-                "top_genres": [],
-                "top_devices": [],
-            }
+            plan_summary = summary.get(row["plan"])
+            if plan_summary is None:
+                avg_hours = row["hours_total"] / row["user_count"]
+                plan_summary = summary[row["plan"]] = {
+                    "count": row["user_count"],
+                    "avg_hours": round(avg_hours, 1) if avg_hours else 0,
+                    "top_genres": [],
+                    "top_devices": [],
+                }
+            if row["facet"] is None:
+                continue
+            key = "top_genres" if row["facet"] == "genre" else "top_devices"
+            plan_summary[key].append(row["value"])
 
-        for plan in summary.keys():
-            genres = self.conn.execute(
-                """
-                SELECT favorite_genre, COUNT(*) AS c
-                FROM users
-                WHERE plan = ?
-                GROUP BY favorite_genre
-                ORDER BY c DESC
-                LIMIT 2
-                """,
-                (plan,),
+        return summary
+
+    def plan_counts(self) -> Dict[str, int]:
+        """Users per plan, from the materialized summary."""
+        with self.pool.read() as conn:
+            rows = conn.execute(
+                "SELECT plan, user_count FROM plan_summary WHERE user_count > 0"
             ).fetchall()
-            summary[plan]["top_genres"] = [row["favorite_genre"] for row in genres]
+        return {row["plan"]: row["user_count"] for row in rows}
+
+    def summary_partials(self) -> Tuple[Dict[str, Tuple[int, int]], Dict[tuple, int]]:
+        """Raw summary counters for merging summaries across databases.
 
-            devices = self.conn.execute(
+        Returns ``{plan: (user_count, hours_total)}`` and
+        ``{(plan, facet, value): user_count}``.
+        """
+        with self.pool.read() as conn:
+            plans = {
+                row["plan"]: (row["user_count"], row["hours_total"])
+                for row in conn.execute(
+                    "SELECT plan, user_count, hours_total FROM plan_summary WHERE user_count > 0"
+                )
+            }
+            facets = {
+                (row["plan"], row["facet"], row["value"]): row["user_count"]
+                for row in conn.execute(
+                    "SELECT plan, facet, value, user_count FROM plan_summary_facets "
+                    "WHERE user_count > 0"
+                )
+            }
+        return plans, facets
+
+    @_writes
+    def rebuild_summary(self) -> List[str]:
+        """Recompute the materialized summary from ``users``.
+
+        Returns a description of every stored row that disagreed with the
+        recomputed aggregates (an empty list means the triggers kept it
+        consistent).
+        """
+        with self.conn:
+            stored = self._summary_snapshot()
+            self.conn.execute("DELETE FROM plan_summary")
+            self.conn.execute("DELETE FROM plan_summary_facets")
+            self.conn.execute(
                 """
-                SELECT preferred_device, COUNT(*) AS c
+                INSERT INTO plan_summary (plan, user_count, hours_total)
+                SELECT plan, COUNT(*), SUM(hours_per_month)
                 FROM users
-                WHERE plan = ?
-                GROUP BY preferred_device
-                ORDER BY c DESC
-                LIMIT 2
-                """,
-                (plan,),
-            ).fetchall()
-            summary[plan]["top_devices"] = [row["preferred_device"] for row in devices]
+                GROUP BY plan
+                """
+            )
+            for facet, column in self.SUMMARY_FACETS.items():
+                self.conn.execute(
+                    f"""
+                    INSERT INTO plan_summary_facets (plan, facet, value, user_count)
+                    SELECT plan, ?, {column}, COUNT(*)
+                    FROM users
+                    GROUP BY plan, {column}
+                    """,
+                    (facet,),
+                )
+            rebuilt = self._summary_snapshot()
 
-        return summary
+        drift = []
+        for key in sorted(set(stored) | set(rebuilt), key=repr):
+            if stored.get(key, 0) != rebuilt.get(key, 0):
+                drift.append(f"{key}: stored={stored.get(key, 0)} actual={rebuilt.get(key, 0)}")
+        return drift
 
     def get_favorite_plan(self) -> Optional[str]:
-        row = self.conn.execute(
-            "SELECT name FROM plans WHERE is_favorite = 1 LIMIT 1"
-        ).fetchone()
+        with self.pool.read() as conn:
+            row = conn.execute("SELECT name FROM plans WHERE is_favorite = 1 LIMIT 1").fetchone()
         return row["name"] if row else None
 
+    @timed_query
+    @_writes
     def set_favorite_plan(self, plan: str) -> Dict:
         plan_row = self.conn.execute(
             "SELECT name FROM plans WHERE LOWER(name) = LOWER(?)",
@@ -206,36 +538,106 @@ class GamePassDatabase:
                 "UPDATE plans SET is_favorite = 1 WHERE LOWER(name) = LOWER(?)",
                 (plan,),
             )
+            self._touch_population_version()
+        self._bump_data_version(plans_changed=True)
 
         return self.get_plan_catalog()
 
-    def get_users_by_plan(self, plan: str, limit: int = 8) -> List[Dict]:
-        rows = self.conn.execute(
-            """
-            SELECT full_name, gamer_tag, preferred_device, favorite_genre, hours_per_month
-            FROM users
-            WHERE plan = ?
-            ORDER BY RANDOM()
-            LIMIT ?
-            """,
-            (plan, limit),
-        ).fetchall()
-        return [
-            {
-                "full_name": row["full_name"],
-                "gamer_tag": row["gamer_tag"],
-                "preferred_device": row["preferred_device"],
-                "favorite_genre": row["favorite_genre"],
-                "hours_per_month": row["hours_per_month"],
-            }
-            for row in rows
-        ]
+    @timed_query
+    def get_users_by_plan(
+        self, plan: str, limit: int = 8, seed: Optional[int] = None
+    ) -> List[Dict]:
+        """Return up to ``limit`` distinct random users on ``plan``.
 
+        Candidate ids are drawn uniformly from the plan's id range and looked
+        up by primary key; ids that are missing or belong to another plan are
+        rejected and redrawn. The cost grows with ``limit`` rather than with
+        the plan size. Pass ``seed`` to make the sample reproducible.
+        """
+        rng = random.Random(seed) if seed is not None else self._random
+        if limit < 1:
+            return []
+        with self.pool.read() as conn:
+            return self._sample_plan(conn, plan, limit, rng)
+
+    def _sample_plan(
+        self, conn: sqlite3.Connection, plan: str, limit: int, rng: random.Random
+    ) -> List[Dict]:
+        count_row = conn.execute(
+            "SELECT user_count FROM plan_summary WHERE plan = ?", (plan,)
+        ).fetchone()
+        total = count_row["user_count"] if count_row else 0
+        if total <= 0:
+            return []
+        if total <= limit:
+            rows = conn.execute(
+                f"SELECT {self.USER_SAMPLE_COLUMNS} FROM users WHERE plan = ? ORDER BY id",
+                (plan,),
+            ).fetchall()
+            rng.shuffle(rows)
+            return [self._sample_row(row) for row in rows]
+
+        bounds = conn.execute(self.PLAN_ID_RANGE_QUERY, (plan, plan)).fetchone()
+        low, high = bounds["low"], bounds["high"]
+        span = high - low + 1
+        density = total / span
+        picked: Dict[int, sqlite3.Row] = {}
+        tried = set()
+        for _ in range(self.SAMPLE_ROUNDS):
+            need = limit - len(picked)
+            untried = span - len(tried)
+            if need <= 0 or untried <= 0:
+                break
+            batch_size = min(untried, int(need / density * 1.5) + 4)
+            candidates = []
+            while len(candidates) < batch_size:
+                candidate = rng.randint(low, high)
+                if candidate not in tried:
+                    tried.add(candidate)
+                    candidates.append(candidate)
+            lookup = self._sample_lookup_sql(len(candidates))
+            found = {row["id"]: row for row in conn.execute(lookup, (plan, *candidates))}
+            for candidate in candidates:
+                if candidate in found and len(picked) < limit:
+                    picked[candidate] = found[candidate]
+
+        if len(picked) < limit:
+            # Very sparse id ranges: fall back to sampling the plan's id index.
+            remaining = [
+                row["id"]
+                for row in conn.execute("SELECT id FROM users WHERE plan = ?", (plan,))
+                if row["id"] not in picked
+            ]
+            extra = rng.sample(remaining, k=min(limit - len(picked), len(remaining)))
+            lookup = self._sample_lookup_sql(len(extra))
+            found = {row["id"]: row for row in conn.execute(lookup, (plan, *extra))}
+            for candidate in extra:
+                picked[candidate] = found[candidate]
+
+        return [self._sample_row(row) for row in picked.values()]
+
+    def _sample_lookup_sql(self, size: int) -> str:
+        placeholders = ", ".join("?" * size)
+        return (
+            f"SELECT {self.USER_SAMPLE_COLUMNS} FROM users "
+            f"WHERE plan = ? AND id IN ({placeholders})"
+        )
+
+    @staticmethod
+    def _sample_row(row: sqlite3.Row) -> Dict:
+        return {
+            "full_name": row["full_name"],
+            "gamer_tag": row["gamer_tag"],
+            "preferred_device": row["preferred_device"],
+            "favorite_genre": row["favorite_genre"],
+            "hours_per_month": row["hours_per_month"],
+        }
+
+    @timed_query
     def get_all_users(self) -> List[Dict]:
         """Return minimal user rows for analytics and simulations."""
-        rows = self.conn.execute(
-            "SELECT id, plan, hours_per_month FROM users"
-        ).fetchall()
+        with self.pool.read() as conn:
+            rows = conn.execute("SELECT id, plan, hours_per_month FROM users").fetchall()
         return [
             {
                 "id": row["id"],
@@ -245,62 +647,296 @@ class GamePassDatabase:
             for row in rows
         ]
 
-    def subscribe_user(self, full_name: str, plan: str) -> Dict:
-        if not full_name or not full_name.strip():
-            raise ValueError("Name is required.")
-        plan_row = self.conn.execute(
-            "SELECT * FROM plans WHERE LOWER(name) = LOWER(?)",
-            (plan,),
-        ).fetchone()
-        if not plan_row:
-            raise ValueError("Unknown plan.")
+    def population_version(self) -> str:
+        """Token that changes on every write to users or plans, persisted across restarts."""
+        with self.pool.read() as conn:
+            row = conn.execute("SELECT value FROM meta WHERE key = 'population_version'").fetchone()
+        return row["value"] if row else ""
 
-        plan_name = plan_row["name"]
-        devices = json.loads(plan_row["devices"])
-        hours_low, hours_high = json.loads(plan_row["hours_range"])
+    @staticmethod
+    def run_key(params: Dict, population_version: str) -> str:
+        """Lookup key for a stored run: a digest of its parameters and population."""
+        canonical = json.dumps(
+            {"params": params, "population_version": population_version},
+            sort_keys=True,
+            separators=(",", ":"),
+        )
+        return hashlib.sha256(canonical.encode("utf-8")).hexdigest()
 
-        hours = self._random.randint(int(hours_low), int(hours_high))
-        favorite_genre = self._random.choice(PeopleGenerator.GENRES)
-        backlog_size = self._random.randint(1, min(4, len(PeopleGenerator.GAME_LIBRARY)))
-        backlog = self._random.sample(PeopleGenerator.GAME_LIBRARY, k=backlog_size)
-        preferred_device = self._random.choice(devices)
-        gamer_tag = self._generate_gamer_tag()
+    @timed_query
+    @_writes
+    def save_simulation_run(
+        self,
+        kind: str,
+        params: Dict,
+        population_version: str,
+        summary: Dict,
+        months: Iterable[Sequence],
+        elapsed_seconds: float,
+    ) -> Optional[int]:
+        """Store a run and its per-month, per-plan rows (in ``RUN_MONTH_COLUMNS`` order).
 
+        Returns the new run id, or None when an identical run is already stored.
+        """
         with self.conn:
-            self.conn.execute(
+            cursor = self.conn.execute(
                 """
-                INSERT INTO users (
-                    full_name, gamer_tag, plan, preferred_device,
-                    favorite_genre, hours_per_month, backlog
+                INSERT INTO simulation_runs (
+                    kind, params_key, params, population_version,
+                    summary, created_at, elapsed_seconds
                 ) VALUES (?, ?, ?, ?, ?, ?, ?)
+                ON CONFLICT (kind, params_key) DO NOTHING
                 """,
                 (
-                    full_name.strip(),
-                    gamer_tag,
-                    plan_name,
-                    preferred_device,
-                    favorite_genre,
-                    hours,
-                    json.dumps(backlog),
+                    kind,
+                    self.run_key(params, population_version),
+                    json.dumps(params, sort_keys=True),
+                    population_version,
+                    json.dumps(summary),
+                    time.time(),
+                    round(elapsed_seconds, 6),
                 ),
             )
+            if not cursor.rowcount:
+                return None
+            run_id = cursor.lastrowid
+            self.conn.executemany(
+                f"INSERT INTO simulation_run_months (run_id, {', '.join(self.RUN_MONTH_COLUMNS)}) "
+                f"VALUES ({', '.join('?' * (len(self.RUN_MONTH_COLUMNS) + 1))})",
+                ((run_id, *row) for row in months),
+            )
+        return run_id
+
+    @timed_query
+    def find_simulation_run(
+        self, kind: str, params: Dict, population_version: str
+    ) -> Optional[Dict]:
+        """The stored run for exactly these parameters and population, with its months."""
+        key = self.run_key(params, population_version)
+        with self.pool.read() as conn:
+            row = conn.execute(
+                f"SELECT {self.RUN_COLUMNS} FROM simulation_runs WHERE kind = ? AND params_key = ?",
+                (kind, key),
+            ).fetchone()
+            return self._run_with_months(conn, row) if row else None
+
+    def get_simulation_run(self, run_id: int) -> Optional[Dict]:
+        with self.pool.read() as conn:
+            row = conn.execute(
+                f"SELECT {self.RUN_COLUMNS} FROM simulation_runs WHERE id = ?", (run_id,)
+            ).fetchone()
+            return self._run_with_months(conn, row) if row else None
+
+    def list_simulation_runs(self, kind: Optional[str] = None, limit: int = 20) -> List[Dict]:
+        """Most recent runs first, without their month rows."""
+        with self.pool.read() as conn:
+            if kind is None:
+                rows = conn.execute(
+                    f"SELECT {self.RUN_COLUMNS} FROM simulation_runs ORDER BY id DESC LIMIT ?",
+                    (limit,),
+                ).fetchall()
+            else:
+                rows = conn.execute(
+                    f"SELECT {self.RUN_COLUMNS} FROM simulation_runs WHERE kind = ? "
+                    "ORDER BY created_at DESC LIMIT ?",
+                    (kind, limit),
+                ).fetchall()
+        return [self._run_record(row) for row in rows]
+
+    def compare_simulation_runs(self, first_id: int, second_id: int) -> Optional[Dict]:
+        """Side-by-side users and profit for two runs, matched on (month, plan)."""
+        with self.pool.read() as conn:
+            runs = [
+                conn.execute(
+                    f"SELECT {self.RUN_COLUMNS} FROM simulation_runs WHERE id = ?", (run_id,)
+                ).fetchone()
+                for run_id in (first_id, second_id)
+            ]
+            if not all(runs):
+                return None
+            rows = conn.execute(
+                """
+                SELECT a.month_index, a.month, a.plan,
+                       a.users AS users_a, b.users AS users_b,
+                       a.profit AS profit_a, b.profit AS profit_b
+                FROM simulation_run_months AS a
+                JOIN simulation_run_months AS b
+                  ON b.run_id = ? AND b.month_index = a.month_index AND b.plan = a.plan
+                WHERE a.run_id = ?
+                ORDER BY a.month_index, a.plan_index
+                """,
+                (second_id, first_id),
+            ).fetchall()
+
+        months: List[Dict] = []
+        for row in rows:
+            if not months or months[-1]["month_index"] != row["month_index"]:
+                months.append(
+                    {"month_index": row["month_index"], "month": row["month"], "plans": {}}
+                )
+            months[-1]["plans"][row["plan"]] = {
+                "users": [row["users_a"], row["users_b"]],
+                "profit": [row["profit_a"], row["profit_b"]],
+                "profit_delta": round(row["profit_b"] - row["profit_a"], 2),
+            }
+        return {"runs": [self._run_record(run) for run in runs], "months": months}
+
+    def _run_with_months(self, conn: sqlite3.Connection, row: sqlite3.Row) -> Dict:
+        record = self._run_record(row)
+        record["months"] = [
+            dict(month)
+            for month in conn.execute(
+                f"SELECT {', '.join(self.RUN_MONTH_COLUMNS)} FROM simulation_run_months "
+                "WHERE run_id = ? ORDER BY month_index, plan_index",
+                (row["id"],),
+            )
+        ]
+        return record
+
+    @staticmethod
+    def _run_record(row: sqlite3.Row) -> Dict:
+        return {
+            "id": row["id"],
+            "kind": row["kind"],
+            "params": json.loads(row["params"]),
+            "population_version": row["population_version"],
+            "summary": json.loads(row["summary"]),
+            "created_at": row["created_at"],
+            "elapsed_seconds": row["elapsed_seconds"],
+        }
+
+    def enable_write_behind(self, max_batch: int = 256, max_delay: float = 0.005) -> None:
+        """Route subscribe_user through a group-commit writer thread."""
+        if self._write_behind is None:
+            self._write_behind = GroupCommitWriter(self, max_batch=max_batch, max_delay=max_delay)
+
+    def disable_write_behind(self) -> None:
+        writer, self._write_behind = self._write_behind, None
+        if writer is not None:
+            writer.stop()
+
+    def write_behind_stats(self) -> Optional[Dict[str, int]]:
+        return self._write_behind.stats() if self._write_behind else None
+
+    @timed_query(rows=lambda user: 1)
+    def subscribe_user(self, full_name: str, plan: str) -> Dict:
+        writer = self._write_behind
+        if writer is not None:
+            # Wait outside the writer lock; the group-commit thread needs it.
+            return writer.submit(full_name, plan).result(timeout=self.WRITE_BEHIND_TIMEOUT)
+        return self._subscribe_user_now(full_name, plan)
 
+    @_writes
+    def _subscribe_user_now(self, full_name: str, plan: str) -> Dict:
+        if not full_name or not full_name.strip():
+            raise ValueError("Name is required.")
+        plan_info = self._subscribable_plans().get(str(plan).lower())
+        if not plan_info:
+            raise ValueError("Unknown plan.")
+
+        user = self._new_subscriber(full_name.strip(), plan_info)
+        with self.conn:
+            cursor = self.conn.execute(self.INSERT_USER_SQL, self._subscriber_row(user))
+            self._touch_population_version()
+        user["id"] = cursor.lastrowid
+        self._bump_data_version()
+
+        return user
+
+    @timed_query(rows=lambda results: sum(r["status"] == "ok" for r in results))
+    @_writes
+    def subscribe_users_bulk(self, entries: Iterable[Sequence[str]]) -> List[Dict]:
+        """Subscribe many (full_name, plan) pairs in a single transaction.
+
+        Plans are validated against one catalog read. Invalid entries do not
+        abort the batch; every entry gets a result in input order, either
+        ``{"status": "ok", "user": ...}`` or ``{"status": "error", "error": ...}``.
+        """
+        plans = self._subscribable_plans()
+        results = []
+        users = []
+        for full_name, plan in entries:
+            full_name = str(full_name or "").strip()
+            plan_info = plans.get(str(plan or "").lower())
+            if not full_name:
+                results.append({"status": "error", "error": "Name is required."})
+            elif not plan_info:
+                results.append({"status": "error", "error": "Unknown plan."})
+            else:
+                user = self._new_subscriber(full_name, plan_info)
+                users.append(user)
+                results.append({"status": "ok", "user": user})
+
+        if users:
+            with self.conn:
+                # One execute per row (same transaction) to learn each new id.
+                for user in users:
+                    cursor = self.conn.execute(self.INSERT_USER_SQL, self._subscriber_row(user))
+                    user["id"] = cursor.lastrowid
+                self._touch_population_version()
+            self._bump_data_version()
+        return results
+
+    def _subscribable_plans(self) -> Dict[str, Dict]:
+        """Plan name, devices and hours range keyed by lower-cased plan name."""
+        return self._cached_catalog()[2]
+
+    def _new_subscriber(self, full_name: str, plan_info: Dict) -> Dict:
+        hours_low, hours_high = plan_info["hours_range"]
+        hours = self._random.randint(int(hours_low), int(hours_high))
+        favorite_genre = self._random.choice(PeopleGenerator.GENRES)
+        backlog_size = self._random.randint(1, min(4, len(PeopleGenerator.GAME_LIBRARY)))
+        backlog = self._random.sample(PeopleGenerator.GAME_LIBRARY, k=backlog_size)
+        preferred_device = self._random.choice(plan_info["devices"])
+        gamer_tag = self._generate_gamer_tag()
         return {
-            "full_name": full_name.strip(),
+            "full_name": full_name,
             "gamer_tag": gamer_tag,
-            "plan": plan_name,
+            "plan": plan_info["name"],
             "preferred_device": preferred_device,
             "favorite_genre": favorite_genre,
             "hours_per_month": hours,
             "backlog": backlog,
         }
 
+    @staticmethod
+    def _subscriber_row(user: Dict) -> tuple:
+        return (
+            user["full_name"],
+            user["gamer_tag"],
+            user["plan"],
+            user["preferred_device"],
+            user["favorite_genre"],
+            user["hours_per_month"],
+            json.dumps(user["backlog"]),
+        )
+
+    def _touch_population_version(self) -> None:
+        """Replace the persisted population token inside the caller's write transaction.
+
+        Committing it with the data change means a crash can never leave new
+        users or plans under a token that stored runs were keyed on. It is a
+        fresh token rather than a counter so no earlier version can come back.
+        """
+        self.conn.execute(
+            "UPDATE meta SET value = ? WHERE key = 'population_version'",
+            (uuid.uuid4().hex,),
+        )
+
+    def _bump_data_version(self, plans_changed: bool = False) -> None:
+        """Advance the in-process version; call only after the write has committed."""
+        with self._version_lock:
+            self.data_version += 1
+        if plans_changed:
+            self._invalidate_catalog()
+
     def _generate_gamer_tag(self) -> str:
         prefix = self._random.choice(PeopleGenerator.TAG_PREFIXES)
         suffix = self._random.choice(PeopleGenerator.TAG_SUFFIXES)
         digits = self._random.randint(10, 999)
         return f"{prefix}{suffix}{digits}"
 
+    @_writes
     def _ensure_favorite_column(self) -> None:
         """Add the favorite flag to plans if an older DB is present."""
         cols = {
@@ -314,6 +950,192 @@ class GamePassDatabase:
                 "ALTER TABLE plans ADD COLUMN is_favorite INTEGER NOT NULL DEFAULT 0"
             )
 
+    def hot_query_plans(self) -> Dict[str, List[str]]:
+        """EXPLAIN QUERY PLAN details for the queries behind the read endpoints."""
+        hot_queries = {
+            "get_user_summary": (self.SUMMARY_QUERY, ()),
+            "get_users_by_plan:range": (self.PLAN_ID_RANGE_QUERY, ("Core", "Core")),
+            "get_users_by_plan:lookup": (self._sample_lookup_sql(3), ("Core", 1, 2, 3)),
+        }
+        with self.pool.read() as conn:
+            return {
+                name: [
+                    row["detail"] for row in conn.execute(f"EXPLAIN QUERY PLAN {sql}", params)
+                ]
+                for name, (sql, params) in hot_queries.items()
+            }
+
+    def full_scan_queries(self) -> Dict[str, List[str]]:
+        """Hot queries whose plan still scans the whole ``users`` table."""
+        offenders = {}
+        for name, details in self.hot_query_plans().items():
+            scans = [detail for detail in details if detail.startswith("SCAN users")]
+            if scans:
+                offenders[name] = scans
+        return offenders
+
+    @_writes
+    def _ensure_user_indexes(self) -> None:
+        with self.conn:
+            for name, target in self.USER_INDEXES.items():
+                self.conn.execute(f"CREATE INDEX IF NOT EXISTS {name} ON {target}")
+
+    @_writes
+    def _ensure_meta_table(self) -> None:
+        with self.conn:
+            self.conn.execute(
+                "CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT NOT NULL)"
+            )
+
+    @_writes
+    def _ensure_run_tables(self) -> None:
+        with self.conn:
+            self.conn.execute(
+                "INSERT OR IGNORE INTO meta (key, value) VALUES ('population_version', ?)",
+                (uuid.uuid4().hex,),
+            )
+            self.conn.execute(
+                """
+                CREATE TABLE IF NOT EXISTS simulation_runs (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    kind TEXT NOT NULL,
+                    params_key TEXT NOT NULL,
+                    params TEXT NOT NULL,
+                    population_version TEXT NOT NULL,
+                    summary TEXT NOT NULL,
+                    created_at REAL NOT NULL,
+                    elapsed_seconds REAL NOT NULL,
+                    UNIQUE (kind, params_key)
+                )
+                """
+            )
+            self.conn.execute(
+                """
+                CREATE TABLE IF NOT EXISTS simulation_run_months (
+                    run_id INTEGER NOT NULL REFERENCES simulation_runs(id) ON DELETE CASCADE,
+                    month_index INTEGER NOT NULL,
+                    month TEXT NOT NULL,
+                    plan_index INTEGER NOT NULL,
+                    plan TEXT NOT NULL,
+                    users INTEGER NOT NULL,
+                    -- untyped: projections store int hours, the profit model floats
+                    total_hours NOT NULL,
+                    avg_hours REAL,
+                    revenue REAL,
+                    cost REAL,
+                    profit REAL NOT NULL,
+                    PRIMARY KEY (run_id, month_index, plan_index)
+                ) WITHOUT ROWID
+                """
+            )
+            for name, target in self.RUN_INDEXES.items():
+                self.conn.execute(f"CREATE INDEX IF NOT EXISTS {name} ON {target}")
+
+    def _summary_snapshot(self) -> Dict:
+        snapshot = {}
+        for row in self.conn.execute(
+            "SELECT plan, user_count, hours_total FROM plan_summary WHERE user_count != 0"
+        ):
+            snapshot[(row["plan"], "count")] = row["user_count"]
+            snapshot[(row["plan"], "hours")] = row["hours_total"]
+        for row in self.conn.execute(
+            "SELECT plan, facet, value, user_count FROM plan_summary_facets WHERE user_count != 0"
+        ):
+            snapshot[(row["plan"], row["facet"], row["value"])] = row["user_count"]
+        return snapshot
+
+    @_writes
+    def _ensure_summary_tables(self) -> None:
+        """Create the materialized plan summary and the triggers that maintain it."""
+        existing = self.conn.execute(
+            "SELECT name FROM sqlite_master WHERE type = 'table' AND name = 'plan_summary'"
+        ).fetchone()
+        triggers = {
+            row["name"]
+            for row in self.conn.execute("SELECT name FROM sqlite_master WHERE type = 'trigger'")
+        }
+        interrupted = self.conn.execute(
+            "SELECT 1 FROM meta WHERE key = ?", (self.BULK_LOAD_MARKER,)
+        ).fetchone()
+        with self.conn:
+            self.conn.execute(
+                """
+                CREATE TABLE IF NOT EXISTS plan_summary (
+                    plan TEXT PRIMARY KEY,
+                    user_count INTEGER NOT NULL DEFAULT 0,
+                    hours_total INTEGER NOT NULL DEFAULT 0
+                )
+                """
+            )
+            self.conn.execute(
+                """
+                CREATE TABLE IF NOT EXISTS plan_summary_facets (
+                    plan TEXT NOT NULL,
+                    facet TEXT NOT NULL,
+                    value TEXT NOT NULL,
+                    user_count INTEGER NOT NULL DEFAULT 0,
+                    PRIMARY KEY (plan, facet, value)
+                )
+                """
+            )
+            for statement in self._summary_trigger_sql():
+                self.conn.execute(statement)
+        if not existing or interrupted or not triggers.issuperset(self.SUMMARY_TRIGGERS):
+            # Older databases already hold users, and an interrupted bulk load
+            # left writes the dropped triggers never saw; backfill either way.
+            self.rebuild_summary()
+            with self.conn:
+                self.conn.execute("DELETE FROM meta WHERE key = ?", (self.BULK_LOAD_MARKER,))
+
+    def _summary_trigger_sql(self) -> List[str]:
+        def add(prefix: str) -> str:
+            facets = "".join(
+                f"""
+                INSERT INTO plan_summary_facets (plan, facet, value, user_count)
+                VALUES ({prefix}.plan, '{facet}', {prefix}.{column}, 1)
+                ON CONFLICT (plan, facet, value) DO UPDATE SET user_count = user_count + 1;"""
+                for facet, column in self.SUMMARY_FACETS.items()
+            )
+            return f"""
+                INSERT INTO plan_summary (plan, user_count, hours_total)
+                VALUES ({prefix}.plan, 1, {prefix}.hours_per_month)
+                ON CONFLICT (plan) DO UPDATE SET
+                    user_count = user_count + 1,
+                    hours_total = hours_total + excluded.hours_total;{facets}"""
+
+        def remove(prefix: str) -> str:
+            facets = "".join(
+                f"""
+                UPDATE plan_summary_facets SET user_count = user_count - 1
+                WHERE plan = {prefix}.plan AND facet = '{facet}' AND value = {prefix}.{column};"""
+                for facet, column in self.SUMMARY_FACETS.items()
+            )
+            return f"""
+                UPDATE plan_summary
+                SET user_count = user_count - 1,
+                    hours_total = hours_total - {prefix}.hours_per_month
+                WHERE plan = {prefix}.plan;{facets}"""
+
+        return [
+            f"""
+            CREATE TRIGGER IF NOT EXISTS users_summary_insert AFTER INSERT ON users
+            BEGIN{add("NEW")}
+            END
+            """,
+            f"""
+            CREATE TRIGGER IF NOT EXISTS users_summary_delete AFTER DELETE ON users
+            BEGIN{remove("OLD")}
+            END
+            """,
+            f"""
+            CREATE TRIGGER IF NOT EXISTS users_summary_update
+            AFTER UPDATE OF plan, hours_per_month, favorite_genre, preferred_device ON users
+            BEGIN{remove("OLD")}{add("NEW")}
+            END
+            """,
+        ]
+
+    @_writes
     def _ensure_default_favorite(self) -> None:
         """Make sure at least one plan is marked favorite for UX defaults."""
         favorite_count = self.conn.execute(
@@ -333,13 +1155,81 @@ class GamePassDatabase:
             )
 
 
-def seed_database(db_path: str = "mudtpass.db", total_users: int = 1000) -> None:
-    generator = PeopleGenerator(total_users)
+def seed_database(
+    db_path: str = "mudtpass.db",
+    total_users: int = 1000,
+    shards: int = 1,
+    seed: Optional[int] = None,
+    per_user_streams: bool = False,
+) -> Dict[str, float]:
+    generator = PeopleGenerator(total_users, seed=seed, per_user_streams=per_user_streams)
     db = GamePassDatabase(db_path)
     db.initialize()
-    users = generator.generate()
-    db.persist(generator.plan_catalog, generator.plan_names, users)
+    batches = generator.generate_sharded(shards) if shards > 1 else generator.generate_iter()
+    users = itertools.chain.from_iterable(batches)
+    return db.bulk_persist(generator.plan_catalog, generator.plan_names, users)
 
 
 if __name__ == "__main__":  # pragma: no cover
-    seed_database()
+    import argparse
+
+    parser = argparse.ArgumentParser(description="MUDTPass database utilities.")
+    parser.add_argument(
+        "command",
+        nargs="?",
+        default="seed",
+        choices=["seed", "rebuild-summary", "check-plans", "snapshot", "restore"],
+    )
+    parser.add_argument("--db", default="mudtpass.db")
+    parser.add_argument("--users", type=int, default=1000, help="Population size for seed.")
+    parser.add_argument("--shards", type=int, default=1, help="Generate on a process pool.")
+    parser.add_argument("--seed", type=int, default=None)
+    parser.add_argument(
+        "--per-user-streams",
+        action="store_true",
+        help="Draw each user from its own seeded stream (same users for any --shards).",
+    )
+    parser.add_argument(
+        "--snapshot", default="mudtpass.seed.db", help="Snapshot file for snapshot/restore."
+    )
+    args = parser.parse_args()
+
+    if args.command == "rebuild-summary":
+        database = GamePassDatabase(args.db)
+        database.initialize()
+        drift = database.rebuild_summary()
+        for line in drift:
+            print(f"drift {line}")
+        print(f"Summary rebuilt ({len(drift)} inconsistent rows).")
+    elif args.command == "check-plans":
+        database = GamePassDatabase(args.db)
+        database.initialize()
+        for name, details in database.hot_query_plans().items():
+            print(f"{name}:")
+            for detail in details:
+                print(f"  {detail}")
+        offenders = database.full_scan_queries()
+        if offenders:
+            raise SystemExit(f"Full table scans found in: {', '.join(offenders)}")
+        print("No full scans of users on hot queries.")
+    elif args.command == "snapshot":
+        database = GamePassDatabase(args.db)
+        database.initialize()
+        stats = database.create_snapshot(args.snapshot)
+        print(f"Wrote {args.snapshot} ({stats['bytes']} bytes) in {stats['seconds']}s.")
+    elif args.command == "restore":
+        database = GamePassDatabase(args.db)
+        stats = database.restore_snapshot(args.snapshot)
+        print(f"Restored {stats['rows']} users from {args.snapshot} in {stats['seconds']}s.")
+    else:
+        stats = seed_database(
+            args.db,
+            total_users=args.users,
+            shards=args.shards,
+            seed=args.seed,
+            per_user_streams=args.per_user_streams,
+        )
+        print(
+            f"Seeded {stats['rows']} users in {stats['seconds']}s "
+            f"({stats['rows_per_second']:.0f} rows/s)."
+        )
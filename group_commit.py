@@ -0,0 +1,100 @@
+"""Write-behind queue that commits pending subscriptions in groups."""
+
+from __future__ import annotations
+
+import queue
+import threading
+import time
+from concurrent.futures import Future
+from typing import Dict, List, Tuple
+
+_STOP = object()
+
+
+class GroupCommitWriter:
+    """
+    Single writer thread that drains queued subscriptions into shared transactions.
+
+    Callers get a ``Future`` per subscription. The writer waits at most
+    ``max_delay`` seconds after the first pending item (or until ``max_batch``
+    items are queued), commits the whole group through
+    ``GamePassDatabase.subscribe_users_bulk`` and then resolves each future
+    with its user, or with ``ValueError`` for invalid input. One commit (and
+    one fsync) is shared by every request in the group, while no request
+    waits longer than the delay plus one commit.
+    """
+
+    def __init__(self, db, max_batch: int = 256, max_delay: float = 0.005) -> None:
+        if max_batch < 1:
+            raise ValueError("max_batch must be at least 1.")
+        self.db = db
+        self.max_batch = max_batch
+        self.max_delay = max_delay
+        self._queue: "queue.Queue" = queue.Queue()
+        self._stats_lock = threading.Lock()
+        self._stats = {"submitted": 0, "committed": 0, "batches": 0, "largest_batch": 0}
+        self._thread = threading.Thread(target=self._run, name="mudtpass-group-commit", daemon=True)
+        self._thread.start()
+
+    def submit(self, full_name: str, plan: str) -> Future:
+        future: Future = Future()
+        with self._stats_lock:
+            self._stats["submitted"] += 1
+        self._queue.put((full_name, plan, future))
+        return future
+
+    def _collect(self, first) -> List[Tuple[str, str, Future]]:
+        batch = [first]
+        deadline = time.monotonic() + self.max_delay
+        while len(batch) < self.max_batch:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                item = self._queue.get(timeout=remaining)
+            except queue.Empty:
+                break
+            if item is _STOP:
+                self._queue.put(_STOP)  # finish this batch, then stop
+                break
+            batch.append(item)
+        return batch
+
+    def _run(self) -> None:
+        while True:
+            first = self._queue.get()
+            if first is _STOP:
+                return
+            batch = self._collect(first)
+            try:
+                results = self.db.subscribe_users_bulk([(name, plan) for name, plan, _ in batch])
+            except Exception as exc:  # noqa: BLE001 - surfaced to every waiting caller
+                for _, _, future in batch:
+                    future.set_exception(exc)
+                continue
+
+            committed = 0
+            for (_, _, future), result in zip(batch, results):
+                if result["status"] == "ok":
+                    committed += 1
+                    future.set_result(result["user"])
+                else:
+                    future.set_exception(ValueError(result["error"]))
+            with self._stats_lock:
+                self._stats["committed"] += committed
+                self._stats["batches"] += 1
+                self._stats["largest_batch"] = max(self._stats["largest_batch"], len(batch))
+
+    def stop(self, timeout: float = 5.0) -> None:
+        """Commit everything already queued, then stop the writer thread."""
+        self._queue.put(_STOP)
+        self._thread.join(timeout)
+
+    def stats(self) -> Dict[str, int]:
+        with self._stats_lock:
+            return {
+                "pending": self._queue.qsize(),
+                "max_batch": self.max_batch,
+                "max_delay_ms": int(self.max_delay * 1000),
+                **self._stats,
+            }
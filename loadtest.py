@@ -0,0 +1,260 @@
+"""
+Load generator for the MUDTPass API.
+
+Drives the frontend's calls with a weighted route mix from ``--concurrency``
+worker threads, either over real HTTP against a running server or in-process
+through Flask's test client, and reports throughput plus p50/p95/p99 latency
+per route:
+
+    python loadtest.py --url http://127.0.0.1:5000 --concurrency 16 --duration 30
+    python loadtest.py --client --requests 2000 --mix plans=4,summary=4,users=2
+
+``subscribe`` inserts real users, so leave it out of the mix (``subscribe=0``)
+when pointing at a database you care about.
+"""
+
+from __future__ import annotations
+
+import argparse
+import http.client
+import json
+import random
+import threading
+import time
+from dataclasses import dataclass, field
+from typing import Callable, Dict, List, Optional, Sequence, Tuple
+from urllib.parse import quote, urlsplit
+
+DEFAULT_MIX = {"plans": 4, "summary": 4, "monthly": 1, "users": 4, "subscribe": 1}
+PERCENTILES = (50, 95, 99)
+
+# (method, path, JSON body) for one request.
+Call = Tuple[str, str, Optional[Dict]]
+
+
+def _route_calls(plans: Sequence[str]) -> Dict[str, Callable[[random.Random], Call]]:
+    return {
+        "plans": lambda rng: ("GET", "/api/plans", None),
+        "summary": lambda rng: ("GET", "/api/users/summary", None),
+        "monthly": lambda rng: ("GET", "/api/analytics/monthly", None),
+        "users": lambda rng: ("GET", f"/api/users/{quote(rng.choice(plans))}", None),
+        "subscribe": lambda rng: (
+            "POST",
+            "/api/subscribe",
+            {"name": f"Load Tester {rng.randrange(1_000_000)}", "plan": rng.choice(plans)},
+        ),
+    }
+
+
+class HttpTransport:
+    """One persistent keep-alive connection per worker thread."""
+
+    def __init__(self, base_url: str, timeout: float = 30.0) -> None:
+        parts = urlsplit(base_url)
+        self.host = parts.hostname or "127.0.0.1"
+        self.port = parts.port or (443 if parts.scheme == "https" else 80)
+        self.secure = parts.scheme == "https"
+        self.timeout = timeout
+        self._local = threading.local()
+
+    def _connection(self) -> http.client.HTTPConnection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            factory = http.client.HTTPSConnection if self.secure else http.client.HTTPConnection
+            conn = self._local.conn = factory(self.host, self.port, timeout=self.timeout)
+        return conn
+
+    def request(self, method: str, path: str, body: Optional[Dict]) -> Tuple[int, bytes]:
+        headers = {"Accept-Encoding": "identity"}
+        data = None
+        if body is not None:
+            data = json.dumps(body).encode("utf-8")
+            headers["Content-Type"] = "application/json"
+        conn = self._connection()
+        try:
+            conn.request(method, path, body=data, headers=headers)
+            response = conn.getresponse()
+            return response.status, response.read()
+        except (OSError, http.client.HTTPException):
+            conn.close()
+            self._local.conn = None
+            raise
+
+
+class ClientTransport:
+    """In-process transport over ``server.app.test_client()`` (one client per thread)."""
+
+    def __init__(self) -> None:
+        import server
+
+        if not server.wait_until_ready():
+            raise RuntimeError(f"Server startup failed: {server.startup_status['error']}")
+        self.app = server.app
+        self._local = threading.local()
+
+    def request(self, method: str, path: str, body: Optional[Dict]) -> Tuple[int, bytes]:
+        client = getattr(self._local, "client", None)
+        if client is None:
+            client = self._local.client = self.app.test_client()
+        response = client.open(path, method=method, json=body)
+        return response.status_code, response.get_data()
+
+
+@dataclass
+class RouteStats:
+    latencies: List[float] = field(default_factory=list)
+    errors: int = 0
+
+
+def percentile(sorted_values: Sequence[float], pct: float) -> float:
+    """Nearest-rank percentile of an already sorted sequence."""
+    if not sorted_values:
+        return 0.0
+    rank = max(1, -(-len(sorted_values) * pct // 100))
+    return sorted_values[int(rank) - 1]
+
+
+def run_load(
+    transport,
+    mix: Dict[str, int],
+    concurrency: int = 8,
+    duration: Optional[float] = 10.0,
+    total_requests: Optional[int] = None,
+    seed: int = 0,
+) -> Tuple[Dict[str, RouteStats], float]:
+    """Issue requests until ``total_requests`` are done or ``duration`` elapses."""
+    if total_requests is None and not (duration and duration > 0):
+        raise ValueError("Give a positive duration or a total request count.")
+    status, body = transport.request("GET", "/api/plans", None)
+    if status != 200:
+        raise RuntimeError(f"/api/plans returned {status}; is the server up?")
+    calls = _route_calls(json.loads(body)["order"])
+    routes = [route for route, weight in mix.items() if weight > 0]
+    weights = [mix[route] for route in routes]
+
+    stats = {route: RouteStats() for route in routes}
+    lock = threading.Lock()
+    remaining = [total_requests]
+    started = time.perf_counter()
+    deadline = started + duration if duration and total_requests is None else None
+
+    def take_ticket() -> bool:
+        if deadline is not None:
+            return time.perf_counter() < deadline
+        with lock:
+            if remaining[0] <= 0:
+                return False
+            remaining[0] -= 1
+            return True
+
+    def worker(index: int) -> None:
+        rng = random.Random(seed * 1_000 + index)
+        local = {route: RouteStats() for route in routes}
+        while take_ticket():
+            route = rng.choices(routes, weights)[0]
+            method, path, payload = calls[route](rng)
+            begin = time.perf_counter()
+            try:
+                status, _ = transport.request(method, path, payload)
+                failed = status >= 400
+            except (OSError, http.client.HTTPException):
+                failed = True
+            local[route].latencies.append(time.perf_counter() - begin)
+            local[route].errors += failed
+        with lock:
+            for route, partial in local.items():
+                stats[route].latencies.extend(partial.latencies)
+                stats[route].errors += partial.errors
+
+    threads = [threading.Thread(target=worker, args=(index,)) for index in range(concurrency)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return stats, time.perf_counter() - started
+
+
+def summarize(stats: Dict[str, RouteStats], elapsed: float) -> Dict[str, Dict]:
+    report = {}
+    everything: List[float] = []
+    errors = 0
+    for route, route_stats in stats.items():
+        latencies = sorted(route_stats.latencies)
+        everything.extend(latencies)
+        errors += route_stats.errors
+        report[route] = _row(latencies, route_stats.errors, elapsed)
+    report["all"] = _row(sorted(everything), errors, elapsed)
+    return report
+
+
+def _row(latencies: Sequence[float], errors: int, elapsed: float) -> Dict:
+    row = {
+        "requests": len(latencies),
+        "errors": errors,
+        "rps": round(len(latencies) / elapsed, 1) if elapsed else 0.0,
+    }
+    for pct in PERCENTILES:
+        row[f"p{pct}_ms"] = round(percentile(latencies, pct) * 1000, 2)
+    return row
+
+
+def _print_report(report: Dict[str, Dict], elapsed: float, concurrency: int) -> None:
+    print(f"\n{elapsed:.1f}s at concurrency {concurrency}")
+    header = f"{'route':<10} {'requests':>9} {'errors':>7} {'req/s':>9}"
+    print(header + "".join(f" {f'p{pct} ms':>9}" for pct in PERCENTILES))
+    for route, row in report.items():
+        line = f"{route:<10} {row['requests']:>9} {row['errors']:>7} {row['rps']:>9.1f}"
+        print(line + "".join(f" {row[f'p{pct}_ms']:>9.2f}" for pct in PERCENTILES))
+
+
+def _parse_mix(text: str) -> Dict[str, int]:
+    mix = {route: 0 for route in DEFAULT_MIX}
+    for part in text.split(","):
+        if not part.strip():
+            continue
+        route, _, weight = part.partition("=")
+        route = route.strip()
+        if route not in mix:
+            raise argparse.ArgumentTypeError(
+                f"Unknown route '{route}'. Choose from: {', '.join(DEFAULT_MIX)}."
+            )
+        mix[route] = int(weight or 1)
+    if not any(mix.values()):
+        raise argparse.ArgumentTypeError("The mix needs at least one route with weight > 0.")
+    return mix
+
+
+if __name__ == "__main__":  # pragma: no cover
+    parser = argparse.ArgumentParser(description="Load-test the MUDTPass API.")
+    target = parser.add_mutually_exclusive_group()
+    target.add_argument("--url", default="http://127.0.0.1:5000", help="Server to drive.")
+    target.add_argument("--client", action="store_true", help="Use the in-process test client.")
+    parser.add_argument(
+        "--mix",
+        type=_parse_mix,
+        default=dict(DEFAULT_MIX),
+        help="Route weights, e.g. plans=4,summary=4,monthly=1,users=4,subscribe=1.",
+    )
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--duration", type=float, default=10.0, help="Seconds to run.")
+    parser.add_argument("--requests", type=int, default=None, help="Stop after N requests.")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--json", default=None, help="Also write the report to this path.")
+    args = parser.parse_args()
+    if args.requests is None and args.duration <= 0:
+        parser.error("--duration must be positive unless --requests is given.")
+
+    transport = ClientTransport() if args.client else HttpTransport(args.url)
+    results, seconds = run_load(
+        transport,
+        args.mix,
+        concurrency=args.concurrency,
+        duration=args.duration,
+        total_requests=args.requests,
+        seed=args.seed,
+    )
+    summary = summarize(results, seconds)
+    _print_report(summary, seconds, args.concurrency)
+    if args.json:
+        with open(args.json, "w") as file:
+            json.dump(summary, file, indent=2)
@@ -1,12 +1,26 @@
+import argparse
+
 from Monthly import MonthlyChanges
 from people import PeopleGenerator
+from sinks import SINKS
 
 
 def main():
-    total_users = 1000  # <-- you can change this anytime
+    parser = argparse.ArgumentParser(description="Simulate a year of MUDTPass plan changes.")
+    parser.add_argument("--users", type=int, default=1000)
+    parser.add_argument("--format", choices=list(SINKS), default="csv")
+    parser.add_argument("--output", default=None, help="Defaults to monthly_changes.<ext>.")
+    parser.add_argument("--quiet", action="store_true", help="Skip the per-month report.")
+    parser.add_argument(
+        "--seed", type=int, default=None, help="Reproducible run from counter-based streams."
+    )
+    args = parser.parse_args()
+    total_users = args.users
 
     print("\nGenerating Game Pass subscribers...")
-    generator = PeopleGenerator(total_users)
+    generator = PeopleGenerator(
+        total_users, seed=args.seed, per_user_streams=args.seed is not None
+    )
     users = generator.generate()
 
     print("\nInitial distribution:")
@@ -22,10 +36,10 @@ def main():
         print(f"             Perks: {perks}")
 
     print("\nStarting monthly simulation...")
-    monthly = MonthlyChanges(users, plan_names=generator.plan_names)
-    monthly.apply_monthly_changes()
+    monthly = MonthlyChanges(users, plan_names=generator.plan_names, seed=args.seed)
+    sink = monthly.apply_monthly_changes(args.output, fmt=args.format, quiet=args.quiet)
 
-    print("\nSaved to: monthly_changes.csv")
+    print(f"\nSaved to: {sink.path}")
 
 
 if __name__ == "__main__":
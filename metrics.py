@@ -0,0 +1,233 @@
+"""
+In-process metrics with Prometheus text exposition.
+
+Sampling is controlled by ``MUDTPASS_METRICS_SAMPLE`` (0 disables it, 1
+records everything, values in between record that fraction of events).
+When sampling is off, every hook reduces to one attribute check.
+"""
+
+from __future__ import annotations
+
+import functools
+import os
+import random
+import threading
+import time
+from bisect import bisect_left
+from contextlib import contextmanager, nullcontext
+from typing import Any, Callable, Dict, Iterator, List, Optional, Sequence, Tuple
+
+DEFAULT_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0)
+
+# SQLite VM instructions between progress-handler callbacks.
+VM_STEP_INTERVAL = 1000
+
+
+class Histogram:
+    """Cumulative-bucket histogram keyed by a tuple of label values."""
+
+    def __init__(
+        self, name: str, help_text: str, labels: Sequence[str], buckets=DEFAULT_BUCKETS
+    ) -> None:
+        self.name = name
+        self.help_text = help_text
+        self.labels = tuple(labels)
+        self.buckets = tuple(buckets)
+        self._series: Dict[Tuple[str, ...], List] = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value: float, *label_values: str) -> None:
+        index = bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(label_values)
+            if series is None:
+                series = self._series[label_values] = [[0] * len(self.buckets), 0.0, 0]
+            if index < len(self.buckets):
+                series[0][index] += 1
+            series[1] += value
+            series[2] += 1
+
+    def render(self) -> Iterator[str]:
+        yield f"# HELP {self.name} {self.help_text}"
+        yield f"# TYPE {self.name} histogram"
+        with self._lock:
+            series = {key: (list(b), s, c) for key, (b, s, c) in self._series.items()}
+        for label_values, (bucket_counts, total, count) in sorted(series.items()):
+            labels = _labels(self.labels, label_values)
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets, bucket_counts):
+                cumulative += bucket_count
+                bucket_labels = _labels(self.labels, label_values, le=bound)
+                yield f"{self.name}_bucket{bucket_labels} {cumulative}"
+            yield f'{self.name}_bucket{_labels(self.labels, label_values, le="+Inf")} {count}'
+            yield f"{self.name}_sum{labels} {total:.6f}"
+            yield f"{self.name}_count{labels} {count}"
+
+
+class Counter:
+    """Monotonic counter keyed by a tuple of label values."""
+
+    def __init__(self, name: str, help_text: str, labels: Sequence[str] = ()) -> None:
+        self.name = name
+        self.help_text = help_text
+        self.labels = tuple(labels)
+        self._values: Dict[Tuple[str, ...], float] = {}
+        self._lock = threading.Lock()
+
+    def inc(self, amount: float = 1, *label_values: str) -> None:
+        with self._lock:
+            self._values[label_values] = self._values.get(label_values, 0) + amount
+
+    def render(self) -> Iterator[str]:
+        yield f"# HELP {self.name} {self.help_text}"
+        yield f"# TYPE {self.name} counter"
+        with self._lock:
+            values = dict(self._values)
+        for label_values, value in sorted(values.items()):
+            yield f"{self.name}{_labels(self.labels, label_values)} {value:g}"
+
+
+def _labels(names: Sequence[str], values: Sequence[str], **extra) -> str:
+    pairs = list(zip(names, values)) + [(key, value) for key, value in extra.items()]
+    if not pairs:
+        return ""
+    return "{" + ",".join(f'{key}="{_escape(value)}"' for key, value in pairs) + "}"
+
+
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+class MetricsRegistry:
+    """The process-wide set of metrics exposed at ``/api/metrics``."""
+
+    def __init__(self, sample_rate: float = 0.0) -> None:
+        self.sample_rate = min(max(sample_rate, 0.0), 1.0)
+        self.enabled = self.sample_rate > 0
+        self.request_seconds = Histogram(
+            "mudtpass_http_request_seconds",
+            "HTTP request latency by route.",
+            ("route", "method", "status"),
+        )
+        self.query_seconds = Histogram(
+            "mudtpass_db_query_seconds",
+            "GamePassDatabase method latency.",
+            ("method",),
+        )
+        self.rows_returned = Counter(
+            "mudtpass_db_rows_returned_total",
+            "Rows returned (or written) by GamePassDatabase methods.",
+            ("method",),
+        )
+        self.vm_steps = Counter(
+            "mudtpass_sqlite_vm_steps_total",
+            "SQLite VM instructions executed; a proxy for rows scanned.",
+        )
+        self.phase_seconds = Histogram(
+            "mudtpass_simulation_phase_seconds",
+            "Time spent in each simulation phase.",
+            ("simulation", "phase"),
+        )
+        self._gauges: Dict[str, Tuple[str, Callable[[], Dict[str, float]]]] = {}
+
+    def sampled(self) -> bool:
+        """Decide whether to record this event."""
+        return self.enabled and (self.sample_rate >= 1.0 or random.random() < self.sample_rate)
+
+    def register_gauges(
+        self, name: str, help_text: str, collect: Callable[[], Dict[str, float]]
+    ) -> None:
+        """Expose ``collect()``'s values as ``name{key=...}`` gauges at render time."""
+        self._gauges[name] = (help_text, collect)
+
+    def simulation(self, simulation: str) -> "SimulationTimer":
+        """Phase timer for one simulation run, sampled (or not) as a whole."""
+        return SimulationTimer(self, simulation, self.sampled())
+
+    @contextmanager
+    def _timed_phase(self, simulation: str, phase: str) -> Iterator[None]:
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.phase_seconds.observe(time.perf_counter() - started, simulation, phase)
+
+    def install_progress_handler(self, conn) -> None:
+        """Count SQLite VM steps on ``conn`` when metrics are enabled."""
+        if not self.enabled:
+            return
+
+        def on_progress() -> int:
+            self.vm_steps.inc(VM_STEP_INTERVAL)
+            return 0
+
+        conn.set_progress_handler(on_progress, VM_STEP_INTERVAL)
+
+    def render(self) -> str:
+        lines: List[str] = []
+        for metric in (
+            self.request_seconds,
+            self.query_seconds,
+            self.rows_returned,
+            self.vm_steps,
+            self.phase_seconds,
+        ):
+            lines.extend(metric.render())
+        for name, (help_text, collect) in self._gauges.items():
+            lines.append(f"# HELP {name} {help_text}")
+            lines.append(f"# TYPE {name} gauge")
+            for key, value in sorted(collect().items()):
+                if isinstance(value, (int, float)):
+                    lines.append(f'{name}{{key="{key}"}} {value:g}')
+        return "\n".join(lines) + "\n"
+
+
+class SimulationTimer:
+    """Times the phases of one simulation run under a single sampling decision.
+
+    Either every phase of the run is recorded or none is, so sampled runs
+    always report complete phase breakdowns.
+    """
+
+    def __init__(self, registry: MetricsRegistry, simulation: str, sampled: bool) -> None:
+        self.registry = registry
+        self.simulation = simulation
+        self.sampled = sampled
+
+    def phase(self, phase: str):
+        """Context manager timing one phase (no-op when the run is not sampled)."""
+        if not self.sampled:
+            return nullcontext()
+        return self.registry._timed_phase(self.simulation, phase)
+
+
+METRICS = MetricsRegistry(float(os.environ.get("MUDTPASS_METRICS_SAMPLE", 0)))
+
+
+def timed_query(method=None, *, rows: Optional[Callable[[Any], int]] = None):
+    """Record latency and row counts for a GamePassDatabase method.
+
+    Rows are counted as the length of list results; methods returning
+    anything else record rows only when they pass ``rows``, a function that
+    maps the result to the number of rows it returned or wrote.
+    """
+
+    def decorate(method):
+        name = method.__name__
+
+        @functools.wraps(method)
+        def wrapper(*args, **kwargs):
+            if not METRICS.sampled():
+                return method(*args, **kwargs)
+            started = time.perf_counter()
+            result = method(*args, **kwargs)
+            METRICS.query_seconds.observe(time.perf_counter() - started, name)
+            if rows is not None:
+                METRICS.rows_returned.inc(rows(result), name)
+            elif isinstance(result, list):
+                METRICS.rows_returned.inc(len(result), name)
+            return result
+
+        return wrapper
+
+    return decorate(method) if method is not None else decorate
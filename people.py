@@ -1,6 +1,13 @@
+import hashlib
+import itertools
+import os
 import random
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
 from dataclasses import dataclass, field
-from typing import Dict, List, Optional
+from typing import Dict, Iterator, List, Optional
+
+from counter_rng import CounterRandom
 
 
 @dataclass
@@ -24,6 +31,10 @@ class PeopleGenerator:
     Builds a synthetic player base that resembles Xbox Game Pass adoption.
     The generator focuses on three tiers that loosely map to the real offering:
     Core, PC Game Pass and Ultimate.
+
+    With ``per_user_streams`` every user is drawn from its own counter-based
+    stream keyed by (seed, user index) rather than one shared ``random.Random``,
+    so sharded and serial generation produce the same population.
     """
 
     DEFAULT_PLANS = {
@@ -245,6 +256,7 @@ class PeopleGenerator:
         total_users: int,
         plan_specs: Optional[Dict[str, Dict]] = None,
         seed: Optional[int] = None,
+        per_user_streams: bool = False,
     ) -> None:
         self.total_users = total_users
         self.plan_specs = plan_specs or self.DEFAULT_PLANS
@@ -262,7 +274,12 @@ class PeopleGenerator:
             }
             for name, spec in self.plan_specs.items()
         }
+        if per_user_streams and seed is None:
+            seed = int.from_bytes(os.urandom(8), "big")
+        self._seed = seed
         self._random = random.Random(seed)
+        self.per_user_streams = per_user_streams
+        self._next_index = 0
 
     def _pick_plan(self) -> str:
         """Randomly choose a plan following the configured distribution."""
@@ -304,10 +321,109 @@ class PeopleGenerator:
             backlog=backlog,
         )
 
+    def _next_user(self) -> GamePassUser:
+        if self.per_user_streams:
+            self._random = CounterRandom(self._seed, "user", self._next_index)
+        self._next_index += 1
+        return self._generate_user(self._pick_plan())
+
     def generate(self) -> Dict[str, List[GamePassUser]]:
         """Produce a dictionary grouped by subscription tier."""
         population: Dict[str, List[GamePassUser]] = {name: [] for name in self.plan_names}
-        for _ in range(self.total_users):
-            plan = self._pick_plan()
-            population[plan].append(self._generate_user(plan))
+        for batch in self.generate_iter():
+            for user in batch:
+                population[user.plan].append(user)
         return population
+
+    def generate_iter(self, batch_size: int = 10_000) -> Iterator[List[GamePassUser]]:
+        """Yield the population in batches instead of holding it all in memory.
+
+        Draws from the same random stream as :meth:`generate`, so a seeded
+        generator produces the same users in the same order either way.
+        """
+        remaining = self.total_users
+        while remaining > 0:
+            size = min(batch_size, remaining)
+            batch = [self._next_user() for _ in range(size)]
+            remaining -= size
+            yield batch
+
+    def generate_columnar(self, batch_size: int = 10_000):
+        """Produce the population as a compact :class:`ColumnarPopulation`.
+
+        Users are encoded batch by batch, so only ``batch_size`` full objects
+        exist at any time.
+        """
+        from population import ColumnarPopulation
+
+        devices = [device for spec in self.plan_specs.values() for device in spec["devices"]]
+        population = ColumnarPopulation(
+            plans=self.plan_names,
+            devices=devices,
+            genres=self.GENRES,
+            first_names=self.FIRST_NAMES,
+            last_names=self.LAST_NAMES,
+            games=self.GAME_LIBRARY,
+        )
+        for batch in self.generate_iter(batch_size):
+            population.extend(batch)
+        return population
+
+    def generate_sharded(
+        self, shards: int, workers: Optional[int] = None, batch_size: int = 10_000
+    ) -> Iterator[List[GamePassUser]]:
+        """Generate the population on a process pool, ``batch_size`` users per task.
+
+        The population is cut into fixed (start, count) ranges and each task
+        builds one range, so at most ``workers * 2`` batches exist at a time
+        however large the population is. ``shards`` sets the default worker
+        count. Each range gets its own seed derived from the generator's seed
+        and the range start, so the output is deterministic for a given
+        (seed, batch_size) pair regardless of how many workers run it; with
+        ``per_user_streams`` it matches :meth:`generate_iter` exactly. Batches
+        are yielded in range order.
+        """
+        if shards < 1:
+            raise ValueError("shards must be at least 1.")
+        if batch_size < 1:
+            raise ValueError("batch_size must be at least 1.")
+        base_seed = self._seed if self._seed is not None else int.from_bytes(os.urandom(8), "big")
+        first = self._next_index
+        end = first + self.total_users
+        jobs = (
+            (
+                min(batch_size, end - start),
+                self.plan_specs,
+                base_seed if self.per_user_streams else _range_seed(base_seed, start - first),
+                start if self.per_user_streams else None,
+            )
+            for start in range(first, end, batch_size)
+        )
+        workers = workers or min(shards, os.cpu_count() or 1)
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            pending: deque = deque()
+            for job in itertools.islice(jobs, workers * 2):
+                pending.append(pool.submit(_generate_range, *job))
+            while pending:
+                batch = pending.popleft().result()
+                for job in itertools.islice(jobs, 1):
+                    pending.append(pool.submit(_generate_range, *job))
+                if batch:
+                    yield batch
+
+
+def _range_seed(base_seed: int, start: int) -> int:
+    """Stable per-range seed (independent of PYTHONHASHSEED and process)."""
+    digest = hashlib.sha256(f"{base_seed}:{start}".encode()).digest()
+    return int.from_bytes(digest[:8], "big")
+
+
+def _generate_range(
+    count: int, plan_specs: Dict[str, Dict], seed: int, start: Optional[int] = None
+) -> List[GamePassUser]:
+    """One task's users; ``start`` is the first user index under per-user streams."""
+    generator = PeopleGenerator(
+        count, plan_specs=plan_specs, seed=seed, per_user_streams=start is not None
+    )
+    generator._next_index = start or 0
+    return next(generator.generate_iter(count), [])
@@ -0,0 +1,119 @@
+"""SQLite connection pool: one dedicated writer plus a bounded set of readers."""
+
+from __future__ import annotations
+
+import queue
+import sqlite3
+import threading
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Dict, Iterator, Union
+
+from metrics import METRICS
+
+
+class ConnectionPool:
+    """
+    Hands out SQLite connections so reads can run concurrently with each other.
+
+    The database runs in WAL mode, so readers never block the writer or each
+    other. All writes go through a single writer connection guarded by a
+    re-entrant lock, which keeps one thread's transaction from interleaving
+    with another's. Reader connections are created lazily up to
+    ``max_readers``; beyond that, callers wait for one to be returned.
+    In-memory databases cannot be shared between connections, so there every
+    read goes through the writer.
+    """
+
+    def __init__(
+        self,
+        path: Union[str, Path],
+        max_readers: int = 8,
+        busy_timeout: float = 5.0,
+    ) -> None:
+        if max_readers < 1:
+            raise ValueError("max_readers must be at least 1.")
+        self.path = path
+        self.max_readers = max_readers
+        self.busy_timeout = busy_timeout
+        self.in_memory = str(path) == ":memory:"
+
+        self.writer = self._connect()
+        if not self.in_memory:
+            self.writer.execute("PRAGMA journal_mode = WAL")
+            self.writer.execute("PRAGMA synchronous = NORMAL")
+        self._write_lock = threading.RLock()
+        self._idle: "queue.LifoQueue[sqlite3.Connection]" = queue.LifoQueue()
+        self._readers_open = 0
+        self._stats_lock = threading.Lock()
+        self._stats = {"read_checkouts": 0, "read_waits": 0, "write_checkouts": 0, "write_waits": 0}
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = sqlite3.connect(self.path, timeout=self.busy_timeout, check_same_thread=False)
+        conn.row_factory = sqlite3.Row
+        conn.execute(f"PRAGMA busy_timeout = {int(self.busy_timeout * 1000)}")
+        METRICS.install_progress_handler(conn)
+        return conn
+
+    def _count(self, key: str) -> None:
+        with self._stats_lock:
+            self._stats[key] += 1
+
+    @contextmanager
+    def write(self) -> Iterator[sqlite3.Connection]:
+        """Hold the writer connection for the duration of the block."""
+        if not self._write_lock.acquire(blocking=False):
+            self._count("write_waits")
+            self._write_lock.acquire()
+        self._count("write_checkouts")
+        try:
+            yield self.writer
+        finally:
+            self._write_lock.release()
+
+    @contextmanager
+    def read(self) -> Iterator[sqlite3.Connection]:
+        """Check out a reader connection for the duration of the block."""
+        if self.in_memory:
+            with self.write() as conn:
+                yield conn
+            return
+
+        self._count("read_checkouts")
+        conn = self._checkout()
+        try:
+            yield conn
+        finally:
+            self._idle.put(conn)
+
+    def _checkout(self) -> sqlite3.Connection:
+        try:
+            return self._idle.get_nowait()
+        except queue.Empty:
+            pass
+        with self._stats_lock:
+            can_open = self._readers_open < self.max_readers
+            if can_open:
+                self._readers_open += 1
+        if can_open:
+            return self._connect()
+        self._count("read_waits")
+        return self._idle.get()
+
+    def stats(self) -> Dict[str, int]:
+        with self._stats_lock:
+            return {
+                "max_readers": self.max_readers,
+                "readers_open": self._readers_open,
+                "readers_idle": self._idle.qsize(),
+                **self._stats,
+            }
+
+    def close(self) -> None:
+        while True:
+            try:
+                self._idle.get_nowait().close()
+            except queue.Empty:
+                break
+        with self._write_lock:
+            self.writer.close()
@@ -0,0 +1,259 @@
+"""Containers for holding a subscriber population grouped by plan."""
+
+from __future__ import annotations
+
+import json
+import random
+from array import array
+from typing import Dict, Iterable, Iterator, List, Sequence
+
+
+class IndexedPopulation:
+    """
+    Per-plan member lists with O(1) removal and O(k) random sampling.
+
+    Wraps the caller's ``Dict[str, List]`` and mutates those lists in place, so
+    anyone holding the dict still sees the current membership. Removal swaps
+    the chosen member with the last one and pops, which means the order of a
+    plan's list is not preserved; plan sizes are.
+    """
+
+    def __init__(self, users: Dict[str, List], rng=random) -> None:
+        self.users = users
+        self._rng = rng
+
+    def size(self, plan: str) -> int:
+        return len(self.users[plan])
+
+    def swap_remove(self, plan: str, index: int):
+        """Remove and return the member at ``index`` in constant time."""
+        members = self.users[plan]
+        removed = members[index]
+        last = members.pop()
+        if index < len(members):
+            members[index] = last
+        return removed
+
+    def take_sample(self, plan: str, count: int, rng=None) -> List:
+        """Remove ``count`` random members of ``plan`` and return them in draw order.
+
+        ``rng`` overrides the population's random source for this one call.
+        """
+        members = self.users[plan]
+        indices = (rng or self._rng).sample(range(len(members)), count)
+        chosen = [members[index] for index in indices]
+        # Highest index first, so a swap never moves a member still to be removed.
+        for index in sorted(indices, reverse=True):
+            self.swap_remove(plan, index)
+        return chosen
+
+    def add(self, plan: str, members: Sequence) -> None:
+        self.users[plan].extend(members)
+
+    def move(self, source: str, destination: str, count: int, rng=None) -> List:
+        """Move ``count`` random members from ``source`` to ``destination``."""
+        moved = self.take_sample(source, count, rng)
+        self.add(destination, moved)
+        return moved
+
+
+class _Vocabulary:
+    """Dictionary encoding between strings and small integer codes."""
+
+    def __init__(self, values: Sequence[str] = ()) -> None:
+        self.values: List[str] = []
+        self._codes: Dict[str, int] = {}
+        for value in values:
+            self.encode(value)
+
+    def encode(self, value: str) -> int:
+        code = self._codes.get(value)
+        if code is None:
+            code = len(self.values)
+            self._codes[value] = code
+            self.values.append(value)
+        return code
+
+    def __len__(self) -> int:
+        return len(self.values)
+
+
+class UserView:
+    """Lightweight read-only row view over one user in a ColumnarPopulation."""
+
+    __slots__ = ("_population", "index")
+
+    def __init__(self, population: "ColumnarPopulation", index: int) -> None:
+        self._population = population
+        self.index = index
+
+    @property
+    def full_name(self) -> str:
+        return self._population.full_name(self.index)
+
+    @property
+    def gamer_tag(self) -> str:
+        return self._population.gamer_tag(self.index)
+
+    @property
+    def plan(self) -> str:
+        population = self._population
+        return population.plans.values[population.plan_codes[self.index]]
+
+    @property
+    def preferred_device(self) -> str:
+        population = self._population
+        return population.devices.values[population.device_codes[self.index]]
+
+    @property
+    def favorite_genre(self) -> str:
+        population = self._population
+        return population.genres.values[population.genre_codes[self.index]]
+
+    @property
+    def hours_per_month(self) -> int:
+        return self._population.hours[self.index]
+
+    @property
+    def backlog(self) -> List[str]:
+        return self._population.backlog(self.index)
+
+    def to_user(self):
+        """Materialize a full ``GamePassUser`` for code that needs a real object."""
+        from people import GamePassUser
+
+        return GamePassUser(
+            full_name=self.full_name,
+            gamer_tag=self.gamer_tag,
+            plan=self.plan,
+            preferred_device=self.preferred_device,
+            hours_per_month=self.hours_per_month,
+            favorite_genre=self.favorite_genre,
+            backlog=self.backlog,
+        )
+
+    def __str__(self) -> str:  # pragma: no cover - convenience for logging
+        return self.full_name
+
+
+class ColumnarPopulation:
+    """
+    Append-only population stored column by column in typed arrays.
+
+    Plan, device, genre, name parts, gamer-tag stems and games are
+    dictionary-encoded as unsigned shorts; backlogs are packed into one value
+    array addressed by an offsets array. A user costs a few dozen bytes
+    instead of a dataclass instance plus its dict and backlog list.
+    """
+
+    NO_DIGITS = -1
+
+    def __init__(
+        self,
+        plans: Sequence[str] = (),
+        devices: Sequence[str] = (),
+        genres: Sequence[str] = (),
+        first_names: Sequence[str] = (),
+        last_names: Sequence[str] = (),
+        games: Sequence[str] = (),
+    ) -> None:
+        self.plans = _Vocabulary(plans)
+        self.devices = _Vocabulary(devices)
+        self.genres = _Vocabulary(genres)
+        self.first_names = _Vocabulary(first_names)
+        self.last_names = _Vocabulary(last_names)
+        self.tag_stems = _Vocabulary()
+        self.games = _Vocabulary(games)
+
+        self.plan_codes = array("H")
+        self.device_codes = array("H")
+        self.genre_codes = array("H")
+        self.first_codes = array("H")
+        self.last_codes = array("H")
+        self.tag_codes = array("H")
+        self.tag_digits = array("i")
+        self.hours = array("H")
+        self.backlog_offsets = array("Q", [0])
+        self.backlog_values = array("H")
+
+    def append(self, user) -> None:
+        """Encode one ``GamePassUser`` (or anything with the same attributes)."""
+        first, _, last = user.full_name.partition(" ")
+        stem, digits = self._split_tag(user.gamer_tag)
+        self.plan_codes.append(self.plans.encode(user.plan))
+        self.device_codes.append(self.devices.encode(user.preferred_device))
+        self.genre_codes.append(self.genres.encode(user.favorite_genre))
+        self.first_codes.append(self.first_names.encode(first))
+        self.last_codes.append(self.last_names.encode(last))
+        self.tag_codes.append(self.tag_stems.encode(stem))
+        self.tag_digits.append(digits)
+        self.hours.append(user.hours_per_month)
+        self.backlog_values.extend(self.games.encode(game) for game in user.backlog)
+        self.backlog_offsets.append(len(self.backlog_values))
+
+    def extend(self, users: Iterable) -> None:
+        for user in users:
+            self.append(user)
+
+    def _split_tag(self, gamer_tag: str):
+        stem = gamer_tag.rstrip("0123456789")
+        digits = gamer_tag[len(stem):]
+        if not digits or digits.startswith("0") or len(digits) > 9:
+            # Keep the tag verbatim when the digits would not round-trip as an int.
+            return gamer_tag, self.NO_DIGITS
+        return stem, int(digits)
+
+    def full_name(self, index: int) -> str:
+        first = self.first_names.values[self.first_codes[index]]
+        last = self.last_names.values[self.last_codes[index]]
+        return f"{first} {last}" if last else first
+
+    def gamer_tag(self, index: int) -> str:
+        stem = self.tag_stems.values[self.tag_codes[index]]
+        digits = self.tag_digits[index]
+        return stem if digits == self.NO_DIGITS else f"{stem}{digits}"
+
+    def backlog(self, index: int) -> List[str]:
+        start, end = self.backlog_offsets[index], self.backlog_offsets[index + 1]
+        return [self.games.values[code] for code in self.backlog_values[start:end]]
+
+    def plan_counts(self) -> Dict[str, int]:
+        counts = [0] * len(self.plans)
+        for code in self.plan_codes:
+            counts[code] += 1
+        return dict(zip(self.plans.values, counts))
+
+    def group_by_plan(self) -> Dict[str, List[UserView]]:
+        """Row views grouped by plan, the shape MonthlyChanges and Dropouts use."""
+        grouped: Dict[str, List[UserView]] = {plan: [] for plan in self.plans.values}
+        plan_values = self.plans.values
+        for index, code in enumerate(self.plan_codes):
+            grouped[plan_values[code]].append(UserView(self, index))
+        return grouped
+
+    def db_rows(self) -> Iterator[tuple]:
+        """Rows in ``GamePassDatabase.INSERT_USER_SQL`` column order."""
+        plans, devices, genres = self.plans.values, self.devices.values, self.genres.values
+        for index in range(len(self)):
+            yield (
+                self.full_name(index),
+                self.gamer_tag(index),
+                plans[self.plan_codes[index]],
+                devices[self.device_codes[index]],
+                genres[self.genre_codes[index]],
+                self.hours[index],
+                json.dumps(self.backlog(index)),
+            )
+
+    def __len__(self) -> int:
+        return len(self.plan_codes)
+
+    def __getitem__(self, index: int) -> UserView:
+        if index < 0:
+            index += len(self)
+        if not 0 <= index < len(self):
+            raise IndexError("population index out of range")
+        return UserView(self, index)
+
+    def __iter__(self) -> Iterator[UserView]:
+        return (UserView(self, index) for index in range(len(self)))
@@ -0,0 +1,506 @@
+"""
+Twelve-month playtime/profit projection used by the analytics endpoint.
+
+Three engines share the same payload shape, and all of them draw from
+:mod:`counter_rng` streams, so a seed means the same thing to each of them.
+The reference ``python`` engine walks every user state in a loop, taking its
+draws from streams keyed on (seed, month, draw) and indexed by the user's
+position; the ``numpy`` engine applies each month as batched array operations
+over the same streams and matches the loop bit for bit. The ``stream`` engine
+keys every user's month on (seed, user id, month) instead, so the projection
+is a sum of independent per-user trajectories: it runs as array operations
+when numpy is available (again bit-identical to its per-user loop), and new
+subscribers can be folded into an existing result in O(months) with
+:func:`fold_in_subscribers`.
+"""
+
+from __future__ import annotations
+
+import time
+from bisect import bisect_right
+from itertools import accumulate
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
+
+try:  # numpy is optional; only the vectorized engine needs it.
+    import numpy as np
+except ImportError:  # pragma: no cover - depends on the environment
+    np = None
+
+from counter_rng import (
+    ALGORITHM,
+    derive_key,
+    mix64_array,
+    uniform_array,
+    uniform_at,
+    uniform_draws,
+)
+from database import GamePassDatabase
+from metrics import METRICS
+from sharding import open_database
+
+MONTH_NAMES = [
+    "January",
+    "February",
+    "March",
+    "April",
+    "May",
+    "June",
+    "July",
+    "August",
+    "September",
+    "October",
+    "November",
+    "December",
+]
+
+PLAN_COSTS = {"Core": 0.12, "PC": 0.16, "Ultimate": 0.22}
+DEFAULT_COST_RATE = 0.15
+SEASONAL_VARIANCE = [1.02, 1.0, 0.96, 0.95, 0.97, 0.99, 1.05, 1.08, 1.04, 1.06, 1.1, 1.14]
+MIGRATION_RATE = 0.12
+VOLATILITY_RANGE = (0.85, 1.25)
+MIN_HOURS = 4
+ULTIMATE_BOOST = 1.15
+
+ENGINES = ("python", "numpy", "stream")
+
+# Draws per user-month under the stream engine: migrate?, new plan, volatility.
+_STREAM_DRAWS = 3
+
+
+def _migration_weights(current: str, plan_order: List[str]) -> List[float]:
+    """Weights for every candidate plan other than ``current``, in plan order."""
+    current_index = plan_order.index(current) if current in plan_order else 0
+    weights = []
+    for candidate_index, candidate in enumerate(plan_order):
+        if candidate == current:
+            continue
+        # Favor mid-tier upgrades but de-emphasize the premium jump.
+        if candidate_index > current_index and candidate_index < len(plan_order) - 1:
+            weights.append(1.4)
+        elif candidate_index > current_index:
+            weights.append(0.9)
+        else:
+            weights.append(1.0)
+    return weights
+
+
+def _month_payload(
+    month: str,
+    plan_order: List[str],
+    plan_totals: Dict[str, Dict[str, int]],
+    plan_prices: Dict[str, float],
+) -> Dict:
+    payload = {"month": month, "plans": {}, "total_profit": 0.0, "total_hours": 0}
+    for plan in plan_order:
+        totals = plan_totals[plan]
+        users_on_plan = totals["users"]
+        total_hours = totals["hours"]
+        revenue = users_on_plan * plan_prices[plan]
+        cost_rate = PLAN_COSTS.get(plan, DEFAULT_COST_RATE)
+        cost = total_hours * cost_rate
+        profit = round(max(revenue - cost, 0.0), 2)
+
+        payload["plans"][plan] = {
+            "users": users_on_plan,
+            "avg_hours": round(total_hours / users_on_plan, 1) if users_on_plan else 0.0,
+            "total_hours": total_hours,
+            "profit": profit,
+        }
+        payload["total_profit"] += profit
+        payload["total_hours"] += total_hours
+    return payload
+
+
+def _position_keys(seed: int, month: int) -> List[int]:
+    """Stream keys for (migrate?, new plan, volatility) draws in one month, by user position."""
+    return [derive_key(seed, "position", month, draw) for draw in range(_STREAM_DRAWS)]
+
+
+def _simulate_python(
+    users: List[Dict], plan_order: List[str], seed: int, months: int
+) -> List[Dict[str, Dict[str, int]]]:
+    user_states = [
+        {
+            "id": user["id"],
+            "plan": user["plan"],
+            "baseline_hours": user["hours_per_month"],
+        }
+        for user in users
+    ]
+    low, high = VOLATILITY_RANGE
+
+    monthly_totals = []
+    for idx in range(months):
+        plan_totals = {plan: {"users": 0, "hours": 0} for plan in plan_order}
+        migrate_key, pick_key, spread_key = _position_keys(seed, idx)
+
+        for position, state in enumerate(user_states):
+            # migrate a subset each month
+            if uniform_at(migrate_key, position) < MIGRATION_RATE and len(plan_order) > 1:
+                state["plan"] = _pick_new_plan_from(
+                    state["plan"], plan_order, uniform_at(pick_key, position)
+                )
+
+            volatility = low + (high - low) * uniform_at(spread_key, position)
+            seasonal = SEASONAL_VARIANCE[idx % len(SEASONAL_VARIANCE)]
+            hours = max(MIN_HOURS, int(state["baseline_hours"] * volatility * seasonal))
+            if state["plan"] == "Ultimate":
+                hours = int(hours * ULTIMATE_BOOST)
+
+            plan_totals[state["plan"]]["users"] += 1
+            plan_totals[state["plan"]]["hours"] += hours
+
+        monthly_totals.append(plan_totals)
+    return monthly_totals
+
+
+def _pick_new_plan_from(current: str, plan_order: List[str], draw: float) -> str:
+    """Destination plan for a migrating user, weighted by ``_migration_weights``."""
+    candidates = [plan for plan in plan_order if plan != current]
+    cumulative = list(accumulate(_migration_weights(current, plan_order)))
+    index = bisect_right(cumulative, draw * cumulative[-1])
+    return candidates[min(index, len(candidates) - 1)]
+
+
+def _stream_draws(seed: int, user_id: int, month: int) -> List[float]:
+    """The uniform [0, 1) draws for one user-month, independent of every other user."""
+    key = derive_key(seed, user_id, month)
+    return [uniform_at(key, draw) for draw in range(_STREAM_DRAWS)]
+
+
+def _user_trajectory(
+    user: Dict, plan_order: List[str], seed: int, months: int
+) -> Iterator[Tuple[str, int]]:
+    """(plan, hours) for each month of one user under the stream engine."""
+    plan = user["plan"]
+    baseline_hours = user["hours_per_month"]
+    low, high = VOLATILITY_RANGE
+    for idx in range(months):
+        migrate, pick, spread = _stream_draws(seed, user["id"], idx)
+        if migrate < MIGRATION_RATE and len(plan_order) > 1:
+            plan = _pick_new_plan_from(plan, plan_order, pick)
+
+        volatility = low + (high - low) * spread
+        seasonal = SEASONAL_VARIANCE[idx % len(SEASONAL_VARIANCE)]
+        hours = max(MIN_HOURS, int(baseline_hours * volatility * seasonal))
+        if plan == "Ultimate":
+            hours = int(hours * ULTIMATE_BOOST)
+        yield plan, hours
+
+
+def _add_trajectories(
+    monthly_totals: List[Dict[str, Dict[str, int]]],
+    users: Iterable[Dict],
+    plan_order: List[str],
+    seed: int,
+) -> None:
+    for user in users:
+        trajectory = _user_trajectory(user, plan_order, seed, len(monthly_totals))
+        for plan_totals, (plan, hours) in zip(monthly_totals, trajectory):
+            plan_totals[plan]["users"] += 1
+            plan_totals[plan]["hours"] += hours
+
+
+def _simulate_stream(
+    users: List[Dict], plan_order: List[str], seed: int, months: int
+) -> List[Dict[str, Dict[str, int]]]:
+    if np is not None and users:
+        return _simulate_stream_numpy(users, plan_order, seed, months)
+    monthly_totals = [
+        {plan: {"users": 0, "hours": 0} for plan in plan_order} for _ in range(months)
+    ]
+    _add_trajectories(monthly_totals, users, plan_order, seed)
+    return monthly_totals
+
+
+def _candidate_tables(plan_order: List[str]):
+    """Per current plan code: destination codes and their cumulative weights."""
+    size = len(plan_order)
+    codes = np.zeros((size, size - 1), dtype=np.int64)
+    cumulative = np.zeros((size, size - 1))
+    for row, current in enumerate(plan_order):
+        codes[row] = [code for code in range(size) if code != row]
+        cumulative[row] = list(accumulate(_migration_weights(current, plan_order)))
+    return codes, cumulative
+
+
+class _ArrayPopulation:
+    """Plan codes and baseline hours as arrays, advanced one month at a time.
+
+    Applies the same float operations in the same order as the per-user loops,
+    so the array engines match them bit for bit given the same draws.
+    """
+
+    def __init__(self, users: List[Dict], plan_order: List[str]) -> None:
+        plan_index = {plan: code for code, plan in enumerate(plan_order)}
+        count = len(users)
+        self.plan_order = plan_order
+        self.plans = np.fromiter(
+            (plan_index[user["plan"]] for user in users), dtype=np.int64, count=count
+        )
+        self.baseline = np.fromiter(
+            (user["hours_per_month"] for user in users), dtype=np.float64, count=count
+        )
+        self.ultimate_code = plan_index.get("Ultimate", -1)
+        self.tables = _candidate_tables(plan_order) if len(plan_order) > 1 else None
+
+    def migrate(self, migrating, picks) -> None:
+        """Move the users at ``migrating`` using one uniform draw each from ``picks``."""
+        if self.tables is None:
+            return
+        codes, cumulative = self.tables
+        current = self.plans[migrating]
+        rows = cumulative[current]
+        targets = picks * rows[:, -1]
+        index = np.minimum((rows <= targets[:, None]).sum(axis=1), len(self.plan_order) - 2)
+        self.plans[migrating] = codes[current, index]
+
+    def month_totals(self, idx: int, spreads) -> Dict[str, Dict[str, int]]:
+        low, high = VOLATILITY_RANGE
+        volatility = low + (high - low) * spreads
+        seasonal = SEASONAL_VARIANCE[idx % len(SEASONAL_VARIANCE)]
+        hours = np.maximum(MIN_HOURS, np.floor(self.baseline * volatility * seasonal))
+        boosted = self.plans == self.ultimate_code
+        hours[boosted] = np.floor(hours[boosted] * ULTIMATE_BOOST)
+
+        size = len(self.plan_order)
+        users_per_plan = np.bincount(self.plans, minlength=size)
+        hours_per_plan = np.bincount(self.plans, weights=hours, minlength=size)
+        return {
+            plan: {"users": int(users_per_plan[code]), "hours": int(hours_per_plan[code])}
+            for code, plan in enumerate(self.plan_order)
+        }
+
+
+def _simulate_stream_numpy(
+    users: List[Dict], plan_order: List[str], seed: int, months: int
+) -> List[Dict[str, Dict[str, int]]]:
+    """The ``stream`` engine over whole arrays; bit-identical to the per-user loop."""
+    population = _ArrayPopulation(users, plan_order)
+    ids = np.fromiter((user["id"] for user in users), dtype=np.uint64, count=len(users))
+    user_keys = mix64_array(np.uint64(derive_key(seed)) ^ ids)
+
+    monthly_totals = []
+    for idx in range(months):
+        keys = mix64_array(user_keys ^ np.uint64(idx))
+        migrating = np.flatnonzero(uniform_array(keys, 0) < MIGRATION_RATE)
+        population.migrate(migrating, uniform_array(keys[migrating], 1))
+        monthly_totals.append(population.month_totals(idx, uniform_array(keys, 2)))
+    return monthly_totals
+
+
+def _simulate_numpy(
+    users: List[Dict], plan_order: List[str], seed: int, months: int
+) -> List[Dict[str, Dict[str, int]]]:
+    """The ``python`` engine as array operations, drawing from the same position streams."""
+    if np is None:
+        raise RuntimeError("The numpy engine requires numpy to be installed.")
+
+    population = _ArrayPopulation(users, plan_order)
+    positions = np.arange(len(users), dtype=np.uint64)
+
+    monthly_totals = []
+    for idx in range(months):
+        migrate_key, pick_key, spread_key = _position_keys(seed, idx)
+        migrating = np.flatnonzero(uniform_draws(migrate_key, positions) < MIGRATION_RATE)
+        population.migrate(migrating, uniform_draws(pick_key, positions[migrating]))
+        monthly_totals.append(population.month_totals(idx, uniform_draws(spread_key, positions)))
+    return monthly_totals
+
+
+SIMULATORS = {"python": _simulate_python, "numpy": _simulate_numpy, "stream": _simulate_stream}
+
+
+def project_monthly_performance(
+    db: GamePassDatabase,
+    seed: int = 1337,
+    engine: str = "python",
+    months: int = len(MONTH_NAMES),
+) -> Dict:
+    """Simulate ``months`` months (12 by default) of playtime, migrations, and profit."""
+    if engine not in ENGINES:
+        raise ValueError(f"Unknown engine '{engine}'. Choose one of: {', '.join(ENGINES)}.")
+    if months < 1:
+        raise ValueError("Projection horizon must be at least one month.")
+
+    timer = METRICS.simulation("projection")
+    with timer.phase("load"):
+        catalog = db.get_plan_catalog()
+        plan_order = catalog["order"]
+        plan_prices = {name: catalog["plans"][name]["price"] for name in plan_order}
+        users = db.get_all_users()
+
+    with timer.phase(f"simulate_{engine}"):
+        monthly_totals = SIMULATORS[engine](users, plan_order, seed, months)
+
+    with timer.phase("aggregate"):
+        return _projection_payload(plan_order, monthly_totals, plan_prices)
+
+
+def _projection_payload(
+    plan_order: List[str],
+    monthly_totals: List[Dict[str, Dict[str, int]]],
+    plan_prices: Dict[str, float],
+) -> Dict:
+    payload = [
+        _month_payload(MONTH_NAMES[idx % len(MONTH_NAMES)], plan_order, plan_totals, plan_prices)
+        for idx, plan_totals in enumerate(monthly_totals)
+    ]
+    return {"plan_order": plan_order, "months": payload}
+
+
+def fold_in_subscribers(
+    db: GamePassDatabase, projection: Dict, users: Iterable[Dict], seed: int
+) -> Dict:
+    """A ``stream`` projection updated with new users, without re-simulating anyone else.
+
+    ``projection`` must come from the ``stream`` engine with the same ``seed``
+    and the current plan catalog; ``users`` need ``id``, ``plan`` and
+    ``hours_per_month``. Each user costs O(months).
+    """
+    catalog = db.get_plan_catalog()
+    plan_order = projection["plan_order"]
+    if plan_order != catalog["order"]:
+        raise ValueError("The plan catalog changed since the projection was computed.")
+    plan_prices = {name: catalog["plans"][name]["price"] for name in plan_order}
+    monthly_totals = [
+        {
+            plan: {"users": totals["users"], "hours": totals["total_hours"]}
+            for plan, totals in month["plans"].items()
+        }
+        for month in projection["months"]
+    ]
+    _add_trajectories(monthly_totals, users, plan_order, seed)
+    return _projection_payload(plan_order, monthly_totals, plan_prices)
+
+
+def _run_params(db: GamePassDatabase, seed: int, engine: str, months: int) -> Dict:
+    """Everything a projection depends on besides the user population."""
+    catalog = db.get_plan_catalog()
+    return {
+        "seed": seed,
+        "engine": engine,
+        "rng": ALGORITHM,
+        "months": months,
+        "prices": {name: catalog["plans"][name]["price"] for name in catalog["order"]},
+        "cost_model": {
+            "plan_costs": PLAN_COSTS,
+            "default_cost_rate": DEFAULT_COST_RATE,
+            "seasonal_variance": SEASONAL_VARIANCE,
+            "migration_rate": MIGRATION_RATE,
+            "volatility_range": list(VOLATILITY_RANGE),
+            "min_hours": MIN_HOURS,
+            "ultimate_boost": ULTIMATE_BOOST,
+        },
+    }
+
+
+def _run_rows(projection: Dict) -> List[tuple]:
+    """Per-month, per-plan rows in ``GamePassDatabase.RUN_MONTH_COLUMNS`` order."""
+    return [
+        (
+            month_index,
+            month["month"],
+            plan_index,
+            plan,
+            month["plans"][plan]["users"],
+            month["plans"][plan]["total_hours"],
+            month["plans"][plan]["avg_hours"],
+            None,
+            None,
+            month["plans"][plan]["profit"],
+        )
+        for month_index, month in enumerate(projection["months"])
+        for plan_index, plan in enumerate(projection["plan_order"])
+    ]
+
+
+def _projection_from_run(run: Dict) -> Dict:
+    """Rebuild the exact ``project_monthly_performance`` payload from a stored run."""
+    plan_order: List[str] = []
+    months: List[Dict] = []
+    for row in run["months"]:
+        if row["month_index"] == 0:
+            plan_order.append(row["plan"])
+        if row["month_index"] == len(months):
+            months.append(
+                {"month": row["month"], "plans": {}, "total_profit": 0.0, "total_hours": 0}
+            )
+        payload = months[-1]
+        payload["plans"][row["plan"]] = {
+            "users": row["users"],
+            "avg_hours": row["avg_hours"],
+            "total_hours": row["total_hours"],
+            "profit": row["profit"],
+        }
+        payload["total_profit"] += row["profit"]
+        payload["total_hours"] += row["total_hours"]
+    return {"plan_order": plan_order, "months": months}
+
+
+def stored_projection(
+    db: GamePassDatabase,
+    seed: int = 1337,
+    engine: str = "python",
+    months: int = len(MONTH_NAMES),
+) -> Dict:
+    """``project_monthly_performance``, answered from ``simulation_runs`` when possible.
+
+    A run with the same parameters, prices, cost model and population version
+    is read back instead of recomputed; new runs are stored unless the
+    population changed while they were being computed.
+    """
+    return versioned_projection(db, seed, engine, months)[0]
+
+
+def versioned_projection(
+    db: GamePassDatabase, seed: int, engine: str, months: int
+) -> Tuple[Dict, Optional[str]]:
+    """:func:`stored_projection` plus the population version it reflects.
+
+    The version is None when the population changed while the projection
+    ran, so callers can avoid caching it under either version.
+    """
+    population_version = db.population_version()
+    params = _run_params(db, seed, engine, months)
+    run = db.find_simulation_run("projection", params, population_version)
+    if run is not None:
+        return _projection_from_run(run), population_version
+
+    started = time.perf_counter()
+    projection = project_monthly_performance(db, seed=seed, engine=engine, months=months)
+    if db.population_version() != population_version:
+        return projection, None
+    final_plans = projection["months"][-1]["plans"]
+    summary = {
+        "total_profit": round(sum(month["total_profit"] for month in projection["months"]), 2),
+        "final_users": {plan: final_plans[plan]["users"] for plan in projection["plan_order"]},
+    }
+    db.save_simulation_run(
+        "projection",
+        params,
+        population_version,
+        summary,
+        _run_rows(projection),
+        time.perf_counter() - started,
+    )
+    return projection, population_version
+
+
+# One database handle per worker process for project_from_path.
+_worker_databases: Dict[str, GamePassDatabase] = {}
+
+
+def project_from_path(
+    db_path: str, seed: int, engine: str, months: int
+) -> Tuple[Dict, Optional[str]]:
+    """Process-pool entry point: a stored or fresh projection for the database at ``db_path``.
+
+    Also returns the population version the projection reflects (None when
+    the population changed while it ran), so the caller can cache it under
+    the right key.
+    """
+    db = _worker_databases.get(db_path)
+    if db is None:
+        db = _worker_databases[db_path] = open_database(db_path)
+    return versioned_projection(db, seed, engine, months)
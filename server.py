@@ -1,118 +1,266 @@
 from __future__ import annotations
 
+import gzip
 import os
-import random
+import threading
+import time
 from pathlib import Path
-from typing import Dict, List, Optional
+from typing import Callable, Dict, List, Optional, Tuple
 
-from flask import Flask, jsonify, request, send_from_directory
+from flask import Flask, Response, g, jsonify, request, send_from_directory
 
-from database import GamePassDatabase, seed_database
+try:  # brotli is optional; gzip is always available.
+    import brotli
+except ImportError:  # pragma: no cover - depends on the environment
+    brotli = None
+
+from cache import LRUCache
+from database import seed_database
+from metrics import METRICS
 from people import PeopleGenerator
+from projection import ENGINES, fold_in_subscribers, versioned_projection
+from sharding import open_database
 
 BASE_DIR = Path(__file__).resolve().parent
 STATIC_DIR = BASE_DIR / "frontend"
-DB_PATH = BASE_DIR / "mudtpass.db"
+DB_PATH = Path(os.environ.get("MUDTPASS_DB", BASE_DIR / "mudtpass.db"))
 
 app = Flask(__name__, static_folder=str(STATIC_DIR), static_url_path="")
 
-db = GamePassDatabase(DB_PATH)
-db.initialize()
-db.seed_if_empty(PeopleGenerator(1000, seed=42))
-
-MONTH_NAMES = [
-    "January",
-    "February",
-    "March",
-    "April",
-    "May",
-    "June",
-    "July",
-    "August",
-    "September",
-    "October",
-    "November",
-    "December",
-]
-
-
-def _pick_new_plan(current: str, plan_order: List[str], rng: random.Random) -> str:
-    """Lightweight migration helper that nudges users across tiers."""
-    if len(plan_order) <= 1:
-        return current
-    candidates = [plan for plan in plan_order if plan != current]
-    current_index = plan_order.index(current) if current in plan_order else 0
-    weights = []
-    for candidate in candidates:
-        candidate_index = plan_order.index(candidate)
-        # Favor mid-tier upgrades but de-emphasize the premium jump.
-        if candidate_index > current_index and candidate_index < len(plan_order) - 1:
-            weights.append(1.4)
-        elif candidate_index > current_index:
-            weights.append(0.9)
-        else:
-            weights.append(1.0)
-    return rng.choices(candidates, weights=weights, k=1)[0]
-
-
-def project_monthly_performance(db: GamePassDatabase, seed: int = 1337) -> Dict:
-    """Simulate 12 months of playtime, migrations, and resulting profit."""
-    catalog = db.get_plan_catalog()
-    plan_order = catalog["order"]
-    plan_prices = {name: catalog["plans"][name]["price"] for name in plan_order}
-    plan_costs = {"Core": 0.12, "PC": 0.16, "Ultimate": 0.22}
-    seasonal_variance = [1.02, 1.0, 0.96, 0.95, 0.97, 0.99, 1.05, 1.08, 1.04, 1.06, 1.1, 1.14]
-
-    users = db.get_all_users()
-    rng = random.Random(seed)
-    user_states = [
-        {
-            "id": user["id"],
-            "plan": user["plan"],
-            "baseline_hours": user["hours_per_month"],
-        }
-        for user in users
-    ]
-
-    months = []
-    for idx, month in enumerate(MONTH_NAMES):
-        plan_totals = {plan: {"users": 0, "hours": 0} for plan in plan_order}
-
-        for state in user_states:
-            if rng.random() < 0.12:  # migrate a subset each month
-                state["plan"] = _pick_new_plan(state["plan"], plan_order, rng)
-
-            volatility = rng.uniform(0.85, 1.25)
-            seasonal = seasonal_variance[idx % len(seasonal_variance)]
-            hours = max(4, int(state["baseline_hours"] * volatility * seasonal))
-            if state["plan"] == "Ultimate":
-                hours = int(hours * 1.15)
+# One file, or MUDTPASS_SHARDS files partitioned by MUDTPASS_SHARD_BY (id or plan).
+db = open_database(DB_PATH)
 
-            plan_totals[state["plan"]]["users"] += 1
-            plan_totals[state["plan"]]["hours"] += hours
+SEED_USERS = int(os.environ.get("MUDTPASS_SEED_USERS", 1000))
+# Prebuilt seed database restored with the backup API instead of regenerating
+# users; written after the first generated seed if it does not exist yet.
+SEED_SNAPSHOT = os.environ.get("MUDTPASS_SEED_SNAPSHOT")
+# Paths served while the database is still being prepared.
+STARTUP_EXEMPT = ("/api/ready", "/api/metrics")
 
-        month_payload = {"month": month, "plans": {}, "total_profit": 0.0, "total_hours": 0}
-        for plan in plan_order:
-            totals = plan_totals[plan]
-            users_on_plan = totals["users"]
-            total_hours = totals["hours"]
-            revenue = users_on_plan * plan_prices[plan]
-            cost_rate = plan_costs.get(plan, 0.15)
-            cost = total_hours * cost_rate
-            profit = round(max(revenue - cost, 0.0), 2)
+startup_done = threading.Event()
+startup_status = {"state": "starting", "source": None, "seconds": None, "error": None}
 
-            month_payload["plans"][plan] = {
-                "users": users_on_plan,
-                "avg_hours": round(total_hours / users_on_plan, 1) if users_on_plan else 0.0,
-                "total_hours": total_hours,
-                "profit": profit,
-            }
-            month_payload["total_profit"] += profit
-            month_payload["total_hours"] += total_hours
 
-        months.append(month_payload)
-
-    return {"plan_order": plan_order, "months": months}
+def prepare_database() -> None:
+    """Create the schema and seed an empty database (runs on a background thread)."""
+    started = time.perf_counter()
+    try:
+        db.initialize()
+        if db.count_users() > 0:
+            source = "existing"
+        elif SEED_SNAPSHOT and db.has_snapshot(SEED_SNAPSHOT):
+            db.restore_snapshot(SEED_SNAPSHOT)
+            source = "snapshot"
+        else:
+            db.seed_if_empty(PeopleGenerator(SEED_USERS, seed=42))
+            source = "generated"
+            if SEED_SNAPSHOT:
+                db.create_snapshot(SEED_SNAPSHOT)
+        if os.environ.get("MUDTPASS_WRITE_BEHIND"):
+            db.enable_write_behind(
+                max_batch=int(os.environ.get("MUDTPASS_WRITE_BATCH", 256)),
+                max_delay=float(os.environ.get("MUDTPASS_WRITE_DELAY_MS", 5)) / 1000,
+            )
+    except Exception as exc:
+        startup_status.update(error=str(exc), state="failed")
+        raise
+    else:
+        startup_status.update(
+            source=source, seconds=round(time.perf_counter() - started, 3), state="ready"
+        )
+    finally:
+        startup_done.set()
+
+
+def is_ready() -> bool:
+    return startup_status["state"] == "ready"
+
+
+def wait_until_ready(timeout: Optional[float] = None) -> bool:
+    """Block until startup seeding finishes; False on timeout or failure."""
+    return startup_done.wait(timeout) and is_ready()
+
+
+threading.Thread(target=prepare_database, name="mudtpass-startup", daemon=True).start()
+
+PROJECTION_SEED = 1337
+PROJECTION_MONTHS = 12
+# ``stream`` projections survive subscribes: new users are folded in, not re-simulated.
+PROJECTION_ENGINE = os.environ.get("MUDTPASS_PROJECTION_ENGINE", "stream")
+MAX_PROJECTION_MONTHS = 60
+projection_cache = LRUCache(maxsize=int(os.environ.get("PROJECTION_CACHE_SIZE", 32)))
+
+COMPRESS_MIN_BYTES = 1024
+MAX_BATCH_SUBSCRIBE = 1000
+MAX_RUNS_LISTED = 200
+RUN_KINDS = ("projection", "profit")
+ENCODINGS = ("br", "gzip") if brotli is not None else ("gzip",)
+
+
+def conditional_json(
+    tag: str, build: Callable[[], object], version: Optional[int] = None
+) -> Response:
+    """JSON response with a strong ETag tied to the database data version.
+
+    A matching ``If-None-Match`` gets a 304 before ``build`` runs, so
+    unchanged polls cost neither the query nor the serialization. ``build``
+    may return ready-made JSON bytes; ``version`` overrides the data version
+    for payloads that change less often than the users table.
+    """
+    version = db.data_version if version is None else version
+    etag = f"{tag}-{db.data_epoch}.{version}"
+    candidates = [etag, *(f"{etag}-{encoding}" for encoding in ENCODINGS)]
+    matched = next((c for c in candidates if request.if_none_match.contains(c)), None)
+    if matched:
+        response = app.response_class(status=304)
+        response.set_etag(matched)
+    else:
+        payload = build()
+        if isinstance(payload, bytes):
+            response = app.response_class(payload, mimetype="application/json")
+        else:
+            response = jsonify(payload)
+        response.set_etag(etag)
+    response.headers["Cache-Control"] = "no-cache"
+    return response
+
+
+METRICS.register_gauges("mudtpass_db_pool", "Connection pool counters.", db.pool_stats)
+METRICS.register_gauges(
+    "mudtpass_projection_cache", "Projection cache counters.", projection_cache.stats
+)
+
+
+@app.before_request
+def start_request_timer() -> None:
+    if METRICS.sampled():
+        g.request_started = time.perf_counter()
+
+
+@app.before_request
+def require_ready():
+    """Answer API calls with 503 until the background startup has seeded the database."""
+    if is_ready() or not request.path.startswith("/api/"):
+        return None
+    if request.path in STARTUP_EXEMPT:
+        return None
+    response = jsonify({"error": "Database is not ready.", **startup_status})
+    response.status_code = 503
+    response.headers["Retry-After"] = "1"
+    return response
+
+
+@app.teardown_request
+def record_request_latency(exc=None) -> None:
+    started = g.pop("request_started", None)
+    if started is None:
+        return
+    route = request.url_rule.rule if request.url_rule else "<unmatched>"
+    status = "500" if exc else str(getattr(g, "response_status", 200))
+    METRICS.request_seconds.observe(time.perf_counter() - started, route, request.method, status)
+
+
+def _negotiated_encoding() -> Optional[str]:
+    for encoding in ENCODINGS:
+        if request.accept_encodings[encoding]:
+            return encoding
+    return None
+
+
+@app.after_request
+def compress_response(response: Response) -> Response:
+    """Compress larger JSON payloads with brotli or gzip when the client accepts it."""
+    g.response_status = response.status_code
+    if (
+        response.status_code != 200
+        or response.direct_passthrough
+        or response.mimetype != "application/json"
+        or "Content-Encoding" in response.headers
+    ):
+        return response
+    encoding = _negotiated_encoding()
+    body = response.get_data()
+    if encoding is None or len(body) < COMPRESS_MIN_BYTES:
+        return response
+
+    if encoding == "br":
+        response.set_data(brotli.compress(body, quality=5))
+    else:
+        response.set_data(gzip.compress(body, compresslevel=5))
+    response.headers["Content-Encoding"] = encoding
+    response.vary.add("Accept-Encoding")
+    etag, weak = response.get_etag()
+    if etag:
+        # Each encoded representation gets its own strong validator.
+        response.set_etag(f"{etag}-{encoding}", weak=weak)
+    return response
+
+
+def projection_params(args) -> Tuple[int, int, str]:
+    """Validate (seed, months, engine) from request query args."""
+    engine = args.get("engine", default=PROJECTION_ENGINE)
+    seed = args.get("seed", default=PROJECTION_SEED, type=int)
+    months = args.get("months", default=PROJECTION_MONTHS, type=int)
+    if not 1 <= months <= MAX_PROJECTION_MONTHS:
+        raise ValueError(f"Months must be between 1 and {MAX_PROJECTION_MONTHS}.")
+    if engine not in ENGINES:
+        raise ValueError(f"Unknown engine '{engine}'. Choose one of: {', '.join(ENGINES)}.")
+    return seed, months, engine
+
+
+def projection_key(seed: int, months: int, engine: str) -> tuple:
+    return (seed, months, engine, db.data_version)
+
+
+def projection_key_at(
+    seed: int, months: int, engine: str, population_version: Optional[str]
+) -> Optional[tuple]:
+    """Cache key for a projection of ``population_version``, or None if that is no longer current.
+
+    ``data_version`` is read before the persisted token; writes bump it only
+    after their commit has replaced the token, so a match means the key is
+    not newer than the data the projection was computed from.
+    """
+    version = db.data_version
+    if population_version is None or db.population_version() != population_version:
+        return None
+    return (seed, months, engine, version)
+
+
+def cached_projection(seed: int, months: int, engine: str) -> dict:
+    """Serve projections from the LRU cache, then from stored runs, until the next write."""
+    key = projection_key(seed, months, engine)
+    projection = projection_cache.get(key)
+    if projection is not None:
+        return projection
+    projection, population_version = versioned_projection(db, seed, engine, months)
+    # Cache only under the version the run simulated: a subscribe that lands
+    # mid-run is already in the result, and folding it in again would count
+    # that user twice.
+    if projection_key_at(seed, months, engine, population_version) == key:
+        projection_cache.put(key, projection)
+    return projection
+
+
+def fold_into_cached_projections(new_users: List[Dict], version_before: int) -> None:
+    """Carry cached ``stream`` projections across a subscribe by folding in the new users.
+
+    Only safe when the subscribe was the sole write since ``version_before``;
+    group commits may batch other callers' users, so write-behind skips it.
+    Runs after the write has committed, so it never fails the request: an
+    entry that cannot be folded (the plan catalog changed) is dropped.
+    """
+    version_after = db.data_version
+    if not new_users or version_after != version_before + 1 or db.write_behind_stats():
+        return
+    for (seed, months, engine, version), projection in projection_cache.items():
+        if engine == "stream" and version == version_before:
+            try:
+                folded = fold_in_subscribers(db, projection, new_users, seed)
+            except ValueError:
+                projection_cache.discard((seed, months, engine, version))
+                continue
+            projection_cache.put((seed, months, engine, version_after), folded)
 
 
 @app.route("/")
@@ -120,9 +268,15 @@ def index() -> str:
     return send_from_directory(app.static_folder, "index.html")
 
 
+@app.route("/api/ready")
+def ready():
+    ready_now = is_ready()
+    return jsonify({"ready": ready_now, **startup_status}), 200 if ready_now else 503
+
+
 @app.route("/api/plans")
 def plans():
-    return jsonify(db.get_plan_catalog())
+    return conditional_json("plans", db.get_plan_catalog_json, version=db.catalog_version)
 
 
 @app.post("/api/plans/favorite")
@@ -140,14 +294,15 @@ def favorite_plan():
 
 @app.route("/api/users/summary")
 def user_summary():
-    return jsonify(db.get_user_summary())
+    return conditional_json("summary", db.get_user_summary)
 
 
 @app.route("/api/users/<plan>")
 def users_by_plan(plan: str):
     limit = request.args.get("limit", default=8, type=int)
+    seed = request.args.get("seed", default=None, type=int)
     plan = plan.title() if plan.islower() else plan
-    users = db.get_users_by_plan(plan, limit=limit)
+    users = db.get_users_by_plan(plan, limit=limit, seed=seed)
     return jsonify({"plan": plan, "users": users})
 
 
@@ -158,10 +313,12 @@ def subscribe():
     plan = payload.get("plan")
     if not name or not plan:
         return jsonify({"error": "Name and plan are required."}), 400
+    version_before = db.data_version
     try:
         user = db.subscribe_user(name, plan)
     except ValueError as exc:
         return jsonify({"error": str(exc)}), 400
+    fold_into_cached_projections([user], version_before)
 
     return jsonify(
         {
@@ -173,9 +330,93 @@ def subscribe():
     )
 
 
+@app.post("/api/subscribe/batch")
+def subscribe_batch():
+    payload = request.get_json(silent=True)
+    items = payload.get("users") if isinstance(payload, dict) else payload
+    if not isinstance(items, list) or not items:
+        return jsonify({"error": "A non-empty list of users is required."}), 400
+    if len(items) > MAX_BATCH_SUBSCRIBE:
+        return jsonify({"error": f"At most {MAX_BATCH_SUBSCRIBE} users per batch."}), 400
+
+    entries = [
+        (item.get("name"), item.get("plan")) if isinstance(item, dict) else (None, None)
+        for item in items
+    ]
+    version_before = db.data_version
+    results = db.subscribe_users_bulk(entries)
+    new_users = [result["user"] for result in results if result["status"] == "ok"]
+    fold_into_cached_projections(new_users, version_before)
+    created = len(new_users)
+    return jsonify(
+        {
+            "status": "ok",
+            "created": created,
+            "failed": len(results) - created,
+            "results": results,
+            "summary": db.get_user_summary(),
+        }
+    )
+
+
 @app.route("/api/analytics/monthly")
 def monthly_projection():
-    return jsonify(project_monthly_performance(db))
+    try:
+        seed, months, engine = projection_params(request.args)
+    except ValueError as exc:
+        return jsonify({"error": str(exc)}), 400
+    try:
+        return conditional_json(
+            f"monthly-{seed}-{months}-{engine}",
+            lambda: cached_projection(seed, months, engine),
+        )
+    except RuntimeError as exc:
+        return jsonify({"error": str(exc)}), 400
+
+
+@app.route("/api/analytics/runs")
+def simulation_runs():
+    kind = request.args.get("kind")
+    limit = request.args.get("limit", default=20, type=int)
+    if kind is not None and kind not in RUN_KINDS:
+        return jsonify({"error": f"Unknown kind. Choose one of: {', '.join(RUN_KINDS)}."}), 400
+    limit = max(1, min(limit, MAX_RUNS_LISTED))
+    return jsonify({"runs": db.list_simulation_runs(kind=kind, limit=limit)})
+
+
+@app.route("/api/analytics/runs/<int:run_id>")
+def simulation_run(run_id: int):
+    run = db.get_simulation_run(run_id)
+    if run is None:
+        return jsonify({"error": "Unknown run."}), 404
+    return jsonify(run)
+
+
+@app.route("/api/analytics/runs/compare")
+def compare_simulation_runs():
+    try:
+        first_id, second_id = (int(part) for part in request.args.get("ids", "").split(","))
+    except ValueError:
+        return jsonify({"error": "Pass two run ids, e.g. ?ids=3,7."}), 400
+    comparison = db.compare_simulation_runs(first_id, second_id)
+    if comparison is None:
+        return jsonify({"error": "Unknown run."}), 404
+    return jsonify(comparison)
+
+
+@app.route("/api/analytics/cache")
+def projection_cache_stats():
+    return jsonify({"data_version": db.data_version, **projection_cache.stats()})
+
+
+@app.route("/api/db/pool")
+def pool_stats():
+    return jsonify({**db.pool_stats(), "write_behind": db.write_behind_stats()})
+
+
+@app.route("/api/metrics")
+def metrics():
+    return Response(METRICS.render(), mimetype="text/plain; version=0.0.4")
 
 
 @app.route("/<path:path>")
@@ -0,0 +1,449 @@
+"""
+Users spread over several SQLite files behind the GamePassDatabase API.
+
+Every shard is a complete GamePassDatabase (its own file, pool and writer
+lock) holding the full plan catalog and a slice of the users, so writes to
+different shards never wait on each other. Users are partitioned either
+
+* by id (``shard_by="id"``): new users go to shards round-robin and their
+  public id is ``local_id * shards + shard``, so ``id % shards`` names the
+  shard that owns a user; or
+* by plan (``shard_by="plan"``): all users on a plan live on one shard,
+  assigned round-robin in catalog display order (a hash spreads a handful
+  of plans too unevenly), so per-plan reads touch one file.
+
+Aggregates (counts, summaries, full user lists, pool statistics) fan out to
+every shard on a thread pool and merge the partial results. Public ids are
+globally unique in both modes.
+"""
+
+from __future__ import annotations
+
+import hashlib
+import itertools
+import os
+import queue
+import random
+import time
+import uuid
+from concurrent.futures import Future, ThreadPoolExecutor
+from pathlib import Path
+from typing import Callable, Dict, Iterable, List, Optional, Sequence, Tuple, Union
+
+from database import GamePassDatabase
+from people import GamePassUser, PeopleGenerator
+from population import ColumnarPopulation
+
+SHARD_KEYS = ("id", "plan")
+
+# Chunks buffered per shard while streaming a bulk load.
+FEED_DEPTH = 2
+
+
+def shard_path(path: Union[str, Path], index: int, shards: int) -> Path:
+    """File for shard ``index`` of ``shards``, e.g. ``mudtpass.shard0of4.db``."""
+    path = Path(path)
+    return path.with_name(f"{path.stem}.shard{index}of{shards}{path.suffix}")
+
+
+def open_database(
+    path: Union[str, Path],
+    shards: Optional[int] = None,
+    shard_by: Optional[str] = None,
+    max_readers: int = 8,
+):
+    """GamePassDatabase for one file, or a sharded one when ``shards`` > 1.
+
+    ``shards`` and ``shard_by`` default to ``MUDTPASS_SHARDS`` and
+    ``MUDTPASS_SHARD_BY`` so worker processes open the same layout.
+    """
+    shards = int(os.environ.get("MUDTPASS_SHARDS", 1)) if shards is None else shards
+    shard_by = shard_by or os.environ.get("MUDTPASS_SHARD_BY", "id")
+    if shards <= 1:
+        return GamePassDatabase(path, max_readers=max_readers)
+    return ShardedGamePassDatabase(path, shards=shards, shard_by=shard_by, max_readers=max_readers)
+
+
+class ShardedGamePassDatabase:
+    """The GamePassDatabase interface over ``shards`` SQLite files."""
+
+    def __init__(
+        self,
+        path: Union[str, Path] = "mudtpass.db",
+        shards: int = 4,
+        shard_by: str = "id",
+        max_readers: int = 8,
+    ) -> None:
+        if shards < 1:
+            raise ValueError("shards must be at least 1.")
+        if shard_by not in SHARD_KEYS:
+            raise ValueError(
+                f"Unknown shard key '{shard_by}'. Choose one of: {', '.join(SHARD_KEYS)}."
+            )
+        self.path = Path(path)
+        self.shard_by = shard_by
+        self.shards = [
+            GamePassDatabase(shard_path(self.path, index, shards), max_readers=max_readers)
+            for index in range(shards)
+        ]
+        self.data_epoch = uuid.uuid4().hex[:12]
+        self._round_robin = itertools.count()
+        self._random = random.Random()
+        # Bulk loads keep one worker per shard busy, so leave room for reads.
+        self._executor = ThreadPoolExecutor(
+            max_workers=2 * shards, thread_name_prefix="mudtpass-shard"
+        )
+
+    # -- routing ---------------------------------------------------------
+
+    @property
+    def shard_count(self) -> int:
+        return len(self.shards)
+
+    def shard_for_id(self, user_id: int) -> int:
+        return user_id % self.shard_count
+
+    def shard_for_plan(self, plan: str, plan_order: Optional[Sequence[str]] = None) -> int:
+        order = self.get_plan_catalog()["order"] if plan_order is None else plan_order
+        return order.index(plan) % self.shard_count if plan in order else 0
+
+    def _route(
+        self,
+        plan: str,
+        position: Optional[int] = None,
+        plan_order: Optional[Sequence[str]] = None,
+    ) -> int:
+        """Shard for a new user on ``plan`` (the ``position``-th of a load, if given)."""
+        if self.shard_by == "plan":
+            return self.shard_for_plan(plan, plan_order)
+        if position is None:
+            position = next(self._round_robin)
+        return position % self.shard_count
+
+    def _route_subscriber(self, plan: str) -> int:
+        if self.shard_by != "plan":
+            return self._route(plan)
+        plan_info = self.shards[0]._subscribable_plans().get(str(plan or "").lower())
+        # Unknown plans are rejected by whichever shard receives them.
+        return self.shard_for_plan(plan_info["name"]) if plan_info else 0
+
+    def _global_id(self, local_id: int, index: int) -> int:
+        return local_id * self.shard_count + index
+
+    def _globalize(self, rows: List[Dict], index: int) -> List[Dict]:
+        for row in rows:
+            row["id"] = self._global_id(row["id"], index)
+        return rows
+
+    def _fan_out(self, call: Callable[[GamePassDatabase], object]) -> List:
+        """Run ``call`` on every shard in parallel; results in shard order."""
+        return list(self._executor.map(call, self.shards))
+
+    # -- versions and statistics ----------------------------------------
+
+    @property
+    def data_version(self) -> int:
+        # Each shard's counter only grows, so the sum changes on every write.
+        return sum(shard.data_version for shard in self.shards)
+
+    @property
+    def catalog_version(self) -> int:
+        return self.shards[0].catalog_version
+
+    def pool_stats(self) -> Dict[str, int]:
+        return _sum_stats(shard.pool_stats() for shard in self.shards)
+
+    def population_version(self) -> str:
+        versions = "".join(shard.population_version() for shard in self.shards)
+        return hashlib.sha256(versions.encode("ascii")).hexdigest()[:32]
+
+    # -- stored simulation runs (kept on the first shard) ----------------
+
+    def save_simulation_run(self, *args, **kwargs) -> Optional[int]:
+        return self.shards[0].save_simulation_run(*args, **kwargs)
+
+    def find_simulation_run(self, *args, **kwargs) -> Optional[Dict]:
+        return self.shards[0].find_simulation_run(*args, **kwargs)
+
+    def get_simulation_run(self, run_id: int) -> Optional[Dict]:
+        return self.shards[0].get_simulation_run(run_id)
+
+    def list_simulation_runs(self, kind: Optional[str] = None, limit: int = 20) -> List[Dict]:
+        return self.shards[0].list_simulation_runs(kind=kind, limit=limit)
+
+    def compare_simulation_runs(self, first_id: int, second_id: int) -> Optional[Dict]:
+        return self.shards[0].compare_simulation_runs(first_id, second_id)
+
+    def enable_write_behind(self, max_batch: int = 256, max_delay: float = 0.005) -> None:
+        for shard in self.shards:
+            shard.enable_write_behind(max_batch=max_batch, max_delay=max_delay)
+
+    def disable_write_behind(self) -> None:
+        for shard in self.shards:
+            shard.disable_write_behind()
+
+    def write_behind_stats(self) -> Optional[Dict[str, int]]:
+        stats = [shard.write_behind_stats() for shard in self.shards]
+        if all(entry is None for entry in stats):
+            return None
+        return _sum_stats(entry for entry in stats if entry)
+
+    # -- schema, loading and snapshots -----------------------------------
+
+    def initialize(self) -> None:
+        self._fan_out(GamePassDatabase.initialize)
+
+    def seed_if_empty(self, generator: PeopleGenerator) -> None:
+        if self.count_users() > 0:
+            return
+        users = generator.generate()
+        self.persist(generator.plan_catalog, generator.plan_names, users)
+
+    def persist(
+        self,
+        plan_catalog: Dict[str, Dict],
+        plan_order: Sequence[str],
+        users: Union[Dict[str, List[GamePassUser]], ColumnarPopulation],
+    ) -> None:
+        if isinstance(users, ColumnarPopulation):
+            members: Iterable = iter(users)
+        else:
+            members = itertools.chain.from_iterable(users.values())
+        buckets: List[Dict[str, List]] = [{} for _ in self.shards]
+        for position, member in enumerate(members):
+            plan = member.plan
+            buckets[self._route(plan, position, plan_order)].setdefault(plan, []).append(member)
+        list(
+            self._executor.map(
+                lambda shard, bucket: shard.persist(plan_catalog, plan_order, bucket),
+                self.shards,
+                buckets,
+            )
+        )
+
+    def bulk_persist(
+        self,
+        plan_catalog: Dict[str, Dict],
+        plan_order: Sequence[str],
+        users: Union[Iterable[GamePassUser], ColumnarPopulation],
+        chunk_size: int = 50_000,
+    ) -> Dict[str, float]:
+        """Stream users into every shard's bulk_persist at once.
+
+        The caller's thread routes users into per-shard chunks; each shard
+        loads from its own bounded queue on a worker thread, so the shards
+        write in parallel and memory stays at a few chunks per shard.
+        """
+        started = time.perf_counter()
+        feeds: List["queue.Queue[Optional[List]]"] = [
+            queue.Queue(maxsize=FEED_DEPTH) for _ in self.shards
+        ]
+        loads: List[Future] = [
+            self._executor.submit(
+                shard.bulk_persist, plan_catalog, plan_order, _drain(feed), chunk_size
+            )
+            for shard, feed in zip(self.shards, feeds)
+        ]
+        buffers: List[List] = [[] for _ in self.shards]
+        try:
+            for position, member in enumerate(users):
+                index = self._route(member.plan, position, plan_order)
+                buffers[index].append(member)
+                if len(buffers[index]) >= chunk_size:
+                    _feed(feeds[index], loads[index], buffers[index])
+                    buffers[index] = []
+        finally:
+            for feed, load, buffer in zip(feeds, loads, buffers):
+                if buffer:
+                    _feed(feed, load, buffer)
+                _feed(feed, load, None)
+        stats = [load.result() for load in loads]
+
+        rows = sum(entry["rows"] for entry in stats)
+        elapsed = time.perf_counter() - started
+        return {
+            "rows": rows,
+            "seconds": round(elapsed, 3),
+            "rows_per_second": round(rows / elapsed, 1) if elapsed else float(rows),
+        }
+
+    def create_snapshot(self, path: Union[str, Path]) -> Dict[str, float]:
+        """Snapshot every shard to ``shard_path(path, index, shards)``."""
+        started = time.perf_counter()
+        stats = list(
+            self._executor.map(
+                lambda index: self.shards[index].create_snapshot(
+                    shard_path(path, index, self.shard_count)
+                ),
+                range(self.shard_count),
+            )
+        )
+        return {
+            "bytes": sum(entry["bytes"] for entry in stats),
+            "seconds": round(time.perf_counter() - started, 3),
+        }
+
+    def has_snapshot(self, path: Union[str, Path]) -> bool:
+        """Whether every shard's snapshot file for ``path`` exists."""
+        return all(
+            GamePassDatabase.has_snapshot(shard_path(path, index, self.shard_count))
+            for index in range(self.shard_count)
+        )
+
+    def restore_snapshot(self, path: Union[str, Path]) -> Dict[str, float]:
+        started = time.perf_counter()
+        stats = list(
+            self._executor.map(
+                lambda index: self.shards[index].restore_snapshot(
+                    shard_path(path, index, self.shard_count)
+                ),
+                range(self.shard_count),
+            )
+        )
+        return {
+            "rows": sum(entry["rows"] for entry in stats),
+            "seconds": round(time.perf_counter() - started, 3),
+        }
+
+    # -- plans ------------------------------------------------------------
+
+    def get_plan_catalog(self) -> Dict:
+        return self.shards[0].get_plan_catalog()
+
+    def get_plan_catalog_json(self) -> bytes:
+        return self.shards[0].get_plan_catalog_json()
+
+    def get_favorite_plan(self) -> Optional[str]:
+        return self.shards[0].get_favorite_plan()
+
+    def set_favorite_plan(self, plan: str) -> Dict:
+        return self._fan_out(lambda shard: shard.set_favorite_plan(plan))[0]
+
+    # -- users ------------------------------------------------------------
+
+    def count_users(self) -> int:
+        return sum(self._fan_out(GamePassDatabase.count_users))
+
+    def get_user_summary(self) -> Dict:
+        """Same shape as GamePassDatabase.get_user_summary, merged from every shard."""
+        plan_totals: Dict[str, List[int]] = {}
+        facet_counts: Dict[tuple, int] = {}
+        for plans, facets in self._fan_out(GamePassDatabase.summary_partials):
+            for plan, (count, hours) in plans.items():
+                totals = plan_totals.setdefault(plan, [0, 0])
+                totals[0] += count
+                totals[1] += hours
+            for key, count in facets.items():
+                facet_counts[key] = facet_counts.get(key, 0) + count
+
+        ranked: Dict[Tuple[str, str], List[Tuple[int, str]]] = {}
+        for (plan, facet, value), count in facet_counts.items():
+            ranked.setdefault((plan, facet), []).append((-count, value))
+
+        summary = {}
+        for plan in sorted(plan_totals):
+            count, hours = plan_totals[plan]
+            avg_hours = hours / count
+            summary[plan] = {
+                "count": count,
+                "avg_hours": round(avg_hours, 1) if avg_hours else 0,
+                "top_genres": [value for _, value in sorted(ranked.get((plan, "genre"), []))[:2]],
+                "top_devices": [
+                    value for _, value in sorted(ranked.get((plan, "device"), []))[:2]
+                ],
+            }
+        return summary
+
+    def rebuild_summary(self) -> List[str]:
+        drift = self._fan_out(GamePassDatabase.rebuild_summary)
+        return [f"shard{index} {line}" for index, lines in enumerate(drift) for line in lines]
+
+    def get_users_by_plan(
+        self, plan: str, limit: int = 8, seed: Optional[int] = None
+    ) -> List[Dict]:
+        """Uniform sample without replacement over the plan's users on all shards."""
+        if limit < 1:
+            return []
+        rng = random.Random(seed) if seed is not None else self._random
+        if self.shard_by == "plan":
+            shard = self.shards[self.shard_for_plan(plan)]
+            return shard.get_users_by_plan(plan, limit=limit, seed=rng.getrandbits(32))
+
+        # Split ``limit`` across shards as sequential draws weighted by the
+        # users each shard still has, then sample every shard independently.
+        remaining = [counts.get(plan, 0) for counts in self._fan_out(GamePassDatabase.plan_counts)]
+        wanted = [0] * self.shard_count
+        for _ in range(min(limit, sum(remaining))):
+            index = rng.choices(range(self.shard_count), weights=remaining)[0]
+            wanted[index] += 1
+            remaining[index] -= 1
+        seeds = [rng.getrandbits(32) for _ in self.shards]
+
+        def sample(index: int) -> List[Dict]:
+            if not wanted[index]:
+                return []
+            return self.shards[index].get_users_by_plan(
+                plan, limit=wanted[index], seed=seeds[index]
+            )
+
+        rows = [row for part in self._executor.map(sample, range(self.shard_count)) for row in part]
+        rng.shuffle(rows)
+        return rows
+
+    def get_all_users(self) -> List[Dict]:
+        parts = self._fan_out(GamePassDatabase.get_all_users)
+        return [
+            row for index, part in enumerate(parts) for row in self._globalize(part, index)
+        ]
+
+    def subscribe_user(self, full_name: str, plan: str) -> Dict:
+        index = self._route_subscriber(plan)
+        return self._globalize([self.shards[index].subscribe_user(full_name, plan)], index)[0]
+
+    def subscribe_users_bulk(self, entries: Iterable[Sequence[str]]) -> List[Dict]:
+        """Split the batch by shard, insert each part in parallel, keep input order."""
+        batches: List[List[Tuple[int, Sequence[str]]]] = [[] for _ in self.shards]
+        for position, entry in enumerate(entries):
+            batches[self._route_subscriber(entry[1])].append((position, entry))
+
+        def insert(index: int) -> List[Tuple[int, Dict]]:
+            batch = batches[index]
+            if not batch:
+                return []
+            results = self.shards[index].subscribe_users_bulk(entry for _, entry in batch)
+            self._globalize([result["user"] for result in results if "user" in result], index)
+            return list(zip((position for position, _ in batch), results))
+
+        placed = sorted(
+            (pair for part in self._executor.map(insert, range(self.shard_count)) for pair in part),
+            key=lambda pair: pair[0],
+        )
+        return [result for _, result in placed]
+
+
+def _sum_stats(entries: Iterable[Dict[str, int]]) -> Dict[str, int]:
+    totals: Dict[str, int] = {}
+    for entry in entries:
+        for key, value in entry.items():
+            totals[key] = totals.get(key, 0) + value
+    return totals
+
+
+def _drain(feed: "queue.Queue[Optional[List]]") -> Iterable:
+    while True:
+        chunk = feed.get()
+        if chunk is None:
+            return
+        yield from chunk
+
+
+def _feed(feed: "queue.Queue[Optional[List]]", load: Future, chunk: Optional[List]) -> None:
+    """Queue ``chunk`` for a shard load without hanging if that load has died."""
+    while True:
+        try:
+            feed.put(chunk, timeout=0.5)
+            return
+        except queue.Full:
+            if load.done():
+                load.result()  # re-raises the shard's error
+                return
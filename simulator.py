@@ -3,16 +3,22 @@ Simple revenue/profit simulator that works with the existing MUDTPass database.
 
 The simulator pulls users from the SQLite DB (see database.py) and estimates
 monthly revenue, infrastructure cost, and profit for each plan based on the
-current user mix and hours played.
+current user mix and hours played. ``simulate_ensemble`` repeats the estimate
+over many randomized scenarios on a process pool and reports percentile bands.
 """
 
 from __future__ import annotations
 
-from dataclasses import dataclass
+import os
+import time
+from array import array
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import asdict, dataclass
 from pathlib import Path
-from typing import Dict, List, Tuple
+from typing import Dict, List, Optional, Sequence, Tuple
 
-from database import GamePassDatabase
+from counter_rng import CounterRandom
+from sharding import open_database
 
 
 @dataclass
@@ -25,6 +31,34 @@ class PlanProfit:
     profit: float
 
 
+@dataclass
+class PlanBand:
+    """Percentile bands (p5/p50/p95) across an ensemble of scenarios."""
+
+    plan: str
+    runs: int
+    users: Dict[str, float]
+    revenue: Dict[str, float]
+    cost: Dict[str, float]
+    profit: Dict[str, float]
+
+
+@dataclass
+class ScenarioRanges:
+    """Ranges each ensemble scenario draws its assumptions from."""
+
+    churn: Tuple[float, float] = (0.01, 0.05)
+    migration: Tuple[float, float] = (0.0, 0.12)
+    hours_sigma: float = 0.15
+    user_volatility: Tuple[float, float] = (0.85, 1.25)
+
+
+PERCENTILES = {"p5": 0.05, "p50": 0.50, "p95": 0.95}
+
+# Population shared with ensemble worker processes (set once per worker).
+_ensemble_state: Dict = {}
+
+
 class SubscriptionSimulator:
     def __init__(
         self,
@@ -32,7 +66,7 @@ class SubscriptionSimulator:
         infra_cost_per_hour: float = 0.20,
         pay_per_use_price: float = 0.40,
     ) -> None:
-        self.db = GamePassDatabase(db_path)
+        self.db = open_database(db_path)
         self.db.initialize()
         self.infra_cost_per_hour = infra_cost_per_hour
         self.pay_per_use_price = pay_per_use_price
@@ -44,10 +78,56 @@ class SubscriptionSimulator:
     def _users(self) -> List[Dict]:
         return self.db.get_all_users()
 
-    def simulate(self) -> Tuple[Dict[str, PlanProfit], PlanProfit]:
+    def simulate(self, reuse: bool = True) -> Tuple[Dict[str, PlanProfit], PlanProfit]:
+        """Per-plan profit and the pay-per-use baseline for the current population.
+
+        Runs are stored in ``simulation_runs``; with ``reuse`` an identical run
+        (same prices, cost model and population version) is read back.
+        """
+        population_version = self.db.population_version()
         prices = self._plan_prices()
-        users = self._users()
+        params = {
+            "prices": prices,
+            "infra_cost_per_hour": self.infra_cost_per_hour,
+            "pay_per_use_price": self.pay_per_use_price,
+        }
+        if reuse:
+            run = self.db.find_simulation_run("profit", params, population_version)
+            if run is not None:
+                return _profit_from_run(run)
+
+        started = time.perf_counter()
+        plan_results, baseline = self._compute_profit(prices, self._users())
+        if self.db.population_version() == population_version:
+            # One row per plan in RUN_MONTH_COLUMNS order; the model has no months.
+            rows = [
+                (
+                    0,
+                    "all",
+                    index,
+                    result.plan,
+                    result.users,
+                    result.total_hours,
+                    None,
+                    result.revenue,
+                    result.cost,
+                    result.profit,
+                )
+                for index, result in enumerate(plan_results.values())
+            ]
+            self.db.save_simulation_run(
+                "profit",
+                params,
+                population_version,
+                {"baseline": asdict(baseline)},
+                rows,
+                time.perf_counter() - started,
+            )
+        return plan_results, baseline
 
+    def _compute_profit(
+        self, prices: Dict[str, float], users: List[Dict]
+    ) -> Tuple[Dict[str, PlanProfit], PlanProfit]:
         plan_hours: Dict[str, float] = {plan: 0.0 for plan in prices}
         plan_counts: Dict[str, int] = {plan: 0 for plan in prices}
 
@@ -91,9 +171,176 @@ class SubscriptionSimulator:
 
         return plan_results, baseline
 
+    def simulate_ensemble(
+        self,
+        runs: int = 200,
+        seed: int = 0,
+        workers: Optional[int] = None,
+        ranges: Optional[ScenarioRanges] = None,
+    ) -> Tuple[Dict[str, PlanBand], PlanBand]:
+        """Run ``runs`` randomized scenarios and return per-plan percentile bands.
+
+        Every scenario draws a churn rate, a migration rate and an hours
+        multiplier, then walks each user with its own hours volatility.
+        Scenario ``i`` is seeded from ``(seed, i)``, so results do not depend
+        on ``workers``. Scenarios are split into chunks across a process pool;
+        each worker receives the population once, at startup.
+        """
+        if runs < 1:
+            raise ValueError("runs must be at least 1.")
+        ranges = ranges or ScenarioRanges()
+        prices = self._plan_prices()
+        plan_names = list(prices)
+        plan_index = {plan: code for code, plan in enumerate(plan_names)}
+        users = [user for user in self._users() if user["plan"] in plan_index]
+        state = (
+            plan_names,
+            array("B", (plan_index[user["plan"]] for user in users)),
+            array("d", (float(user["hours_per_month"]) for user in users)),
+            ranges,
+        )
+
+        workers = workers or os.cpu_count() or 1
+        chunk_count = min(runs, workers * 4)
+        chunks = [list(range(runs))[part::chunk_count] for part in range(chunk_count)]
+        if workers == 1:
+            _init_ensemble_worker(*state)
+            results = [_run_scenarios(seed, chunk) for chunk in chunks]
+        else:
+            with ProcessPoolExecutor(
+                max_workers=workers, initializer=_init_ensemble_worker, initargs=state
+            ) as pool:
+                results = list(pool.map(_run_scenarios, [seed] * len(chunks), chunks))
+        scenarios = [scenario for chunk in results for scenario in chunk]
+
+        bands: Dict[str, PlanBand] = {}
+        totals = [[0.0, 0.0, 0.0] for _ in scenarios]
+        for code, plan in enumerate(plan_names):
+            users_on_plan, revenue, cost = [], [], []
+            for run, (counts, hours) in enumerate(scenarios):
+                plan_revenue = prices[plan] * counts[code]
+                plan_cost = hours[code] * self.infra_cost_per_hour
+                users_on_plan.append(counts[code])
+                revenue.append(plan_revenue)
+                cost.append(plan_cost)
+                totals[run][0] += counts[code]
+                totals[run][1] += plan_revenue
+                totals[run][2] += plan_cost
+            bands[plan] = _band(plan, users_on_plan, revenue, cost)
+
+        total = _band(
+            "All plans",
+            [run[0] for run in totals],
+            [run[1] for run in totals],
+            [run[2] for run in totals],
+        )
+        return bands, total
+
+
+def _profit_from_run(run: Dict) -> Tuple[Dict[str, PlanProfit], PlanProfit]:
+    plan_results = {
+        row["plan"]: PlanProfit(
+            plan=row["plan"],
+            users=row["users"],
+            total_hours=row["total_hours"],
+            revenue=row["revenue"],
+            cost=row["cost"],
+            profit=row["profit"],
+        )
+        for row in run["months"]
+    }
+    return plan_results, PlanProfit(**run["summary"]["baseline"])
+
+
+def _percentiles(values: Sequence[float]) -> Dict[str, float]:
+    """Linear-interpolated percentiles, rounded to cents."""
+    ordered = sorted(values)
+    last = len(ordered) - 1
+    bands = {}
+    for name, quantile in PERCENTILES.items():
+        position = quantile * last
+        low = int(position)
+        high = min(low + 1, last)
+        value = ordered[low] + (ordered[high] - ordered[low]) * (position - low)
+        bands[name] = round(value, 2)
+    return bands
+
+
+def _band(
+    plan: str, users: List[float], revenue: List[float], cost: List[float]
+) -> PlanBand:
+    return PlanBand(
+        plan=plan,
+        runs=len(users),
+        users=_percentiles(users),
+        revenue=_percentiles(revenue),
+        cost=_percentiles(cost),
+        profit=_percentiles([r - c for r, c in zip(revenue, cost)]),
+    )
+
+
+def _init_ensemble_worker(
+    plan_names: List[str], plan_codes: array, hours: array, ranges: ScenarioRanges
+) -> None:
+    _ensemble_state.update(
+        plan_names=plan_names, plan_codes=plan_codes, hours=hours, ranges=ranges
+    )
+
+
+def _run_scenarios(seed: int, scenario_ids: List[int]) -> List[Tuple[List[int], List[float]]]:
+    """Per-plan (user counts, hours) for each scenario id."""
+    plan_count = len(_ensemble_state["plan_names"])
+    plan_codes = _ensemble_state["plan_codes"]
+    baseline_hours = _ensemble_state["hours"]
+    ranges: ScenarioRanges = _ensemble_state["ranges"]
+    others = [[code for code in range(plan_count) if code != plan] for plan in range(plan_count)]
+
+    results = []
+    for scenario in scenario_ids:
+        rng = CounterRandom(seed, "ensemble", scenario)
+        churn = rng.uniform(*ranges.churn)
+        migration = rng.uniform(*ranges.migration)
+        scale = rng.lognormvariate(0.0, ranges.hours_sigma)
+        low, high = ranges.user_volatility
+
+        counts = [0] * plan_count
+        hours = [0.0] * plan_count
+        for plan, baseline in zip(plan_codes, baseline_hours):
+            if rng.random() < churn:
+                continue
+            if others[plan] and rng.random() < migration:
+                plan = rng.choice(others[plan])
+            counts[plan] += 1
+            hours[plan] += baseline * scale * rng.uniform(low, high)
+        results.append((counts, hours))
+    return results
+
+
+def _print_ensemble(bands: Dict[str, PlanBand], total: PlanBand) -> None:
+    def fmt(values: Dict[str, float]) -> str:
+        return "/".join(str(values[name]) for name in PERCENTILES)
+
+    print(f"=== Ensemble ({total.runs} scenarios, p5 / p50 / p95) ===")
+    for band in [*bands.values(), total]:
+        print(
+            f"{band.plan:<10} revenue=${fmt(band.revenue)} "
+            f"cost=${fmt(band.cost)} profit=${fmt(band.profit)}"
+        )
+
 
 if __name__ == "__main__":  # pragma: no cover
+    import argparse
+
+    parser = argparse.ArgumentParser(description="MUDTPass profit simulation.")
+    parser.add_argument("--runs", type=int, default=0, help="Ensemble size (0 = point estimate).")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--workers", type=int, default=None)
+    args = parser.parse_args()
+
     simulator = SubscriptionSimulator()
+    if args.runs:
+        _print_ensemble(*simulator.simulate_ensemble(args.runs, args.seed, args.workers))
+        raise SystemExit(0)
     plan_results, baseline = simulator.simulate()
 
     print("=== Subscription profit simulation ===")
@@ -0,0 +1,245 @@
+"""
+Output sinks for MonthlyChanges results.
+
+Every sink receives the same calls: ``open`` with the plan names, one
+``write_month`` per simulated month, then ``write_initial_counts`` and
+``write_initial_users``, and finally ``close``. Files are written through
+large buffers, and row groups go out in bulk calls.
+"""
+
+from __future__ import annotations
+
+import csv
+import json
+import struct
+import sys
+from abc import ABC, abstractmethod
+from array import array
+from pathlib import Path
+from typing import Dict, Iterable, List, Sequence, Tuple, Union
+
+BUFFER_SIZE = 1 << 20
+
+
+class ResultSink(ABC):
+    """Base sink; subclasses write one output format and must implement every write."""
+
+    extension = ""
+
+    def __init__(self, path: Union[str, Path]) -> None:
+        self.path = Path(path)
+        self.plan_names: List[str] = []
+
+    def open(self, plan_names: Sequence[str]) -> None:
+        self.plan_names = list(plan_names)
+
+    @abstractmethod
+    def write_month(self, month: str, counts: Sequence[int], dropped: Sequence[int]) -> None:
+        """Record the plan sizes and dropouts for one month."""
+
+    @abstractmethod
+    def write_initial_counts(self, counts: Sequence[int]) -> None:
+        """Record the plan sizes before the first month."""
+
+    @abstractmethod
+    def write_initial_users(self, rows: Iterable[Tuple[str, str]]) -> None:
+        """Record every (user, plan) pair before the first month."""
+
+    def close(self) -> None:
+        pass
+
+    def __enter__(self) -> "ResultSink":
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.close()
+
+
+class CsvSink(ResultSink):
+    """The original ``monthly_changes.csv`` layout, byte for byte."""
+
+    extension = ".csv"
+
+    def open(self, plan_names: Sequence[str]) -> None:
+        super().open(plan_names)
+        self._file = open(self.path, "w", newline="", buffering=BUFFER_SIZE)
+        self._writer = csv.writer(self._file)
+        self._writer.writerow(["Month", *self.plan_names])
+
+    def write_month(self, month: str, counts: Sequence[int], dropped: Sequence[int]) -> None:
+        self._writer.writerow([month, *counts])
+
+    def write_initial_counts(self, counts: Sequence[int]) -> None:
+        self._writer.writerow([])
+        self._writer.writerow(["Initial Number of Users per Plan"])
+        self._writer.writerows(zip(self.plan_names, counts))
+
+    def write_initial_users(self, rows: Iterable[Tuple[str, str]]) -> None:
+        self._writer.writerow([])
+        self._writer.writerow(["Initial Users", "Plan"])
+        self._writer.writerows(rows)
+
+    def close(self) -> None:
+        self._file.close()
+
+
+class NdjsonSink(ResultSink):
+    """One JSON object per line, tagged with a ``type`` field."""
+
+    extension = ".ndjson"
+
+    def open(self, plan_names: Sequence[str]) -> None:
+        super().open(plan_names)
+        self._file = open(self.path, "w", buffering=BUFFER_SIZE)
+        self._write({"type": "header", "plans": self.plan_names})
+
+    def _write(self, record: Dict) -> None:
+        self._file.write(json.dumps(record, separators=(",", ":")) + "\n")
+
+    def write_month(self, month: str, counts: Sequence[int], dropped: Sequence[int]) -> None:
+        self._write(
+            {
+                "type": "month",
+                "month": month,
+                "users": dict(zip(self.plan_names, counts)),
+                "dropouts": dict(zip(self.plan_names, dropped)),
+            }
+        )
+
+    def write_initial_counts(self, counts: Sequence[int]) -> None:
+        self._write({"type": "initial_counts", "users": dict(zip(self.plan_names, counts))})
+
+    def write_initial_users(self, rows: Iterable[Tuple[str, str]]) -> None:
+        dumps = json.JSONEncoder(separators=(",", ":")).encode
+        self._file.writelines(
+            dumps({"type": "initial_user", "name": name, "plan": plan}) + "\n"
+            for name, plan in rows
+        )
+
+    def close(self) -> None:
+        self._file.close()
+
+
+class ColumnarSink(ResultSink):
+    """
+    Compact little-endian binary layout, readable with :func:`read_columnar`.
+
+    Layout: magic, plan names, months (name plus uint32 counts and dropouts
+    per plan), uint32 initial counts, then initial users as a name
+    dictionary, uint32 name codes and uint8 plan codes.
+    """
+
+    extension = ".mcol"
+    MAGIC = b"MUDTMC1\0"
+
+    def open(self, plan_names: Sequence[str]) -> None:
+        super().open(plan_names)
+        self._months: List[str] = []
+        self._counts = array("I")
+        self._dropped = array("I")
+        self._initial_counts = array("I", [0] * len(self.plan_names))
+        self._names: Dict[str, int] = {}
+        self._name_codes = array("I")
+        self._plan_codes = array("B")
+
+    def write_month(self, month: str, counts: Sequence[int], dropped: Sequence[int]) -> None:
+        self._months.append(month)
+        self._counts.extend(counts)
+        self._dropped.extend(dropped)
+
+    def write_initial_counts(self, counts: Sequence[int]) -> None:
+        self._initial_counts = array("I", counts)
+
+    def write_initial_users(self, rows: Iterable[Tuple[str, str]]) -> None:
+        plan_codes = {plan: code for code, plan in enumerate(self.plan_names)}
+        names = self._names
+        for name, plan in rows:
+            code = names.get(name)
+            if code is None:
+                code = names[name] = len(names)
+            self._name_codes.append(code)
+            self._plan_codes.append(plan_codes[plan])
+
+    def close(self) -> None:
+        with open(self.path, "wb", buffering=BUFFER_SIZE) as file:
+            file.write(self.MAGIC)
+            _write_strings(file, self.plan_names)
+            _write_strings(file, self._months)
+            for values in (self._counts, self._dropped, self._initial_counts):
+                _write_array(file, values)
+            _write_strings(file, list(self._names))
+            _write_array(file, self._name_codes)
+            _write_array(file, self._plan_codes)
+
+
+def _write_strings(file, values: Sequence[str]) -> None:
+    encoded = [value.encode("utf-8") for value in values]
+    _write_array(file, array("I", (len(value) for value in encoded)))
+    file.write(b"".join(encoded))
+
+
+def _write_array(file, values: array) -> None:
+    data = array(values.typecode, values)
+    if sys.byteorder == "big":
+        data.byteswap()  # always store little-endian
+    file.write(struct.pack("<I", len(data)))
+    file.write(data.tobytes())
+
+
+def _read_array(file, typecode: str) -> array:
+    (length,) = struct.unpack("<I", file.read(4))
+    data = array(typecode)
+    data.frombytes(file.read(length * data.itemsize))
+    if sys.byteorder == "big":
+        data.byteswap()
+    return data
+
+
+def _read_strings(file) -> List[str]:
+    lengths = _read_array(file, "I")
+    blob = file.read(sum(lengths))
+    values, offset = [], 0
+    for length in lengths:
+        values.append(blob[offset:offset + length].decode("utf-8"))
+        offset += length
+    return values
+
+
+def read_columnar(path: Union[str, Path]) -> Dict:
+    """Load a file written by :class:`ColumnarSink` back into plain Python data."""
+    with open(path, "rb") as file:
+        if file.read(len(ColumnarSink.MAGIC)) != ColumnarSink.MAGIC:
+            raise ValueError(f"{path} is not a MonthlyChanges columnar file.")
+        plans = _read_strings(file)
+        months = _read_strings(file)
+        counts, dropped, initial = (_read_array(file, "I") for _ in range(3))
+        names = _read_strings(file)
+        name_codes = _read_array(file, "I")
+        plan_codes = _read_array(file, "B")
+
+    width = len(plans)
+    return {
+        "plans": plans,
+        "months": [
+            {
+                "month": month,
+                "users": dict(zip(plans, counts[row * width:(row + 1) * width])),
+                "dropouts": dict(zip(plans, dropped[row * width:(row + 1) * width])),
+            }
+            for row, month in enumerate(months)
+        ],
+        "initial_counts": dict(zip(plans, initial)),
+        "initial_users": [(names[name], plans[plan]) for name, plan in zip(name_codes, plan_codes)],
+    }
+
+
+SINKS = {"csv": CsvSink, "ndjson": NdjsonSink, "columnar": ColumnarSink}
+
+
+def make_sink(fmt: str, path: Union[str, Path, None] = None) -> ResultSink:
+    """Build a sink for ``fmt``; ``path`` defaults to ``monthly_changes`` plus its extension."""
+    try:
+        sink_class = SINKS[fmt]
+    except KeyError:
+        raise ValueError(f"Unknown format '{fmt}'. Choose one of: {', '.join(SINKS)}.") from None
+    return sink_class(path or f"monthly_changes{sink_class.extension}")
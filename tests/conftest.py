@@ -0,0 +1,18 @@
+import importlib
+import os
+import sys
+from pathlib import Path
+
+import pytest
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+
+@pytest.fixture(scope="session")
+def server(tmp_path_factory):
+    """The Flask app module, seeded into a throwaway database."""
+    os.environ["MUDTPASS_DB"] = str(tmp_path_factory.mktemp("db") / "mudtpass.db")
+    os.environ.setdefault("MUDTPASS_SEED_USERS", "300")
+    module = importlib.import_module("server")
+    assert module.wait_until_ready(60), module.startup_status
+    return module
@@ -0,0 +1,45 @@
+import projection
+
+
+def january_users(body):
+    return sum(plan["users"] for plan in body["months"][0]["plans"].values())
+
+
+def test_subscribe_during_projection_is_counted_once(server, monkeypatch):
+    server.projection_cache.clear()
+    client = server.app.test_client()
+    simulate = projection.project_monthly_performance
+    subscribed = []
+
+    def simulate_after_subscribe(*args, **kwargs):
+        # The subscribe commits after the request keyed its cache entry but
+        # before the simulation reads the population.
+        subscribed.append(server.db.subscribe_user("Mid Run", "Core"))
+        return simulate(*args, **kwargs)
+
+    version_before = server.db.data_version
+    monkeypatch.setattr(projection, "project_monthly_performance", simulate_after_subscribe)
+    first = client.get("/api/analytics/monthly").get_json()
+    monkeypatch.setattr(projection, "project_monthly_performance", simulate)
+    server.fold_into_cached_projections(subscribed, version_before)
+
+    assert january_users(first) == server.db.count_users()
+    after = client.get("/api/analytics/monthly").get_json()
+    assert january_users(after) == server.db.count_users()
+
+
+def test_fold_failure_drops_entry_without_failing_subscribe(server):
+    server.projection_cache.clear()
+    client = server.app.test_client()
+    body = client.get("/api/analytics/monthly").get_json()
+    key = server.projection_key(server.PROJECTION_SEED, server.PROJECTION_MONTHS, "stream")
+    assert key in server.projection_cache
+    stale = dict(body, plan_order=list(reversed(body["plan_order"])))
+    server.projection_cache.put(key, stale)
+
+    response = client.post("/api/subscribe", json={"name": "After Reorder", "plan": "Core"})
+
+    assert response.status_code == 200
+    assert key not in server.projection_cache
+    refreshed = client.get("/api/analytics/monthly").get_json()
+    assert january_users(refreshed) == server.db.count_users()
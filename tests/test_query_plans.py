@@ -0,0 +1,31 @@
+import pytest
+
+from database import GamePassDatabase, seed_database
+
+# The index each hot query is meant to be answered from.
+INTENDED_INDEXES = {
+    "get_user_summary": "USING INDEX sqlite_autoindex_plan_summary_1",
+    "get_users_by_plan:range": "USING COVERING INDEX idx_users_plan_id",
+    "get_users_by_plan:lookup": "USING INTEGER PRIMARY KEY",
+}
+
+
+@pytest.fixture(scope="module")
+def db(tmp_path_factory):
+    path = tmp_path_factory.mktemp("plans") / "mudtpass.db"
+    seed_database(str(path), total_users=500, seed=7)
+    database = GamePassDatabase(str(path))
+    database.initialize()
+    return database
+
+
+def test_no_hot_query_scans_users(db):
+    assert db.full_scan_queries() == {}
+
+
+@pytest.mark.parametrize("name", sorted(INTENDED_INDEXES))
+def test_hot_query_uses_intended_index(db, name):
+    details = db.hot_query_plans()[name]
+    assert any(INTENDED_INDEXES[name] in detail for detail in details), details
+    users = [detail for detail in details if " users " in f"{detail} "]
+    assert all(detail.startswith("SEARCH users") for detail in users), details